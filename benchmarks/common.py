@@ -0,0 +1,40 @@
+"""Shared helpers for the pyprogressive benchmarks."""
+
+import json
+import platform
+import sys
+import time
+
+def metadata():
+    """Environment description stored with every benchmark result file."""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "argv": sys.argv[1:],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def write_json(payload, path):
+    """Write *payload* to *path*, or to stdout when *path* is None or '-'."""
+    text = json.dumps(payload, indent=2, sort_keys=True)
+    if path in (None, "-"):
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def scenario_name(params):
+    return ",".join(f"{key}={params[key]}" for key in sorted(params))
+
+def run_to_end(program, **kwargs):
+    """Drive ``program.run()`` to completion; returns the final IterState."""
+    state = None
+    for state in program.run(**kwargs):
+        pass
+    return state
+
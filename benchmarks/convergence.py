@@ -0,0 +1,206 @@
+"""Convergence benchmark: accuracy against time for Program.run.
+
+For standard workloads (mean, variance, covariance, correlation and group
+mean) over sorted and shuffled copies of one synthetic dataset, every tick
+of ``Program.run`` is recorded as ``(elapsed, progress, |estimate - exact|,
+relative error)``.  The summary gives, per threshold, the time and
+progress after which the relative error stays below it, so changes to scan
+order, sampling and scheduling can be compared::
+
+    python benchmarks/convergence.py --output conv.json
+    python benchmarks/convergence.py --scan stratified --no-curves
+"""
+
+import argparse
+import math
+import random
+import sys
+
+import pyprogressive as pp
+from pyprogressive import accum, each, group, G
+
+from common import metadata, write_json
+
+
+def generate(rows, groups, seed=0):
+    """x ~ N(5, 2), y correlated with x, and Zipf-sized group keys."""
+    rng = random.Random(seed)
+    xs = [rng.gauss(5.0, 2.0) for _ in range(rows)]
+    ys = [0.6 * x + rng.gauss(1.0, 1.0) for x in xs]
+    weights = [1.0 / (k + 1) for k in range(groups)]
+    keys = rng.choices(range(groups), weights=weights, k=rows)
+    # make the group means differ so a biased scan order shows up
+    xs = [x + 0.1 * k for x, k in zip(xs, keys)]
+    return list(zip(keys, xs, ys))
+
+
+def reorder(data, order, seed=0):
+    if order == "sorted":
+        return sorted(data, key=lambda row: row[1])
+    data = list(data)
+    random.Random(seed).shuffle(data)
+    return data
+
+
+# --- exact answers --------------------------------------------------------
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+def _cov(a, b):
+    ma, mb = _mean(a), _mean(b)
+    return sum((u - ma) * (v - mb) for u, v in zip(a, b)) / len(a)
+
+
+def _group_mean(keys, values):
+    sums, counts = {}, {}
+    for k, v in zip(keys, values):
+        sums[k] = sums.get(k, 0.0) + v
+        counts[k] = counts.get(k, 0) + 1
+    return {k: sums[k] / counts[k] for k in sums}
+
+
+EXACT = {
+    "mean":        lambda k, x, y: _mean(x),
+    "variance":    lambda k, x, y: _cov(x, x),
+    "covariance":  lambda k, x, y: _cov(x, y),
+    "correlation": lambda k, x, y: _cov(x, y) / math.sqrt(_cov(x, x) * _cov(y, y)),
+    "group_mean":  lambda k, x, y: _group_mean(k, x),
+}
+
+
+# --- progressive programs -------------------------------------------------
+
+def _moments(x, y):
+    n = len(x)
+    mx = accum(each(x)) / n
+    my = accum(each(y)) / n
+    vx = accum(each(x) ** 2) / n - mx ** 2
+    vy = accum(each(y) ** 2) / n - my ** 2
+    cxy = accum(each(x) * each(y)) / n - mx * my
+    return mx, vx, vy, cxy
+
+
+def build(workload, data):
+    pp.reset()
+    keyed = pp.array([(k, x) for k, x, _ in data])
+    x = pp.array([row[1] for row in data])
+    y = pp.array([row[2] for row in data])
+    mx, vx, vy, cxy = _moments(x, y)
+    var = {
+        "mean": mx,
+        "variance": vx,
+        "covariance": cxy,
+        "correlation": cxy / pp.sqrt(vx * vy),
+        "group_mean": group(each(keyed, 0), accum(each(G, 1)) / accum(1)),
+    }[workload]
+    return pp.compile(var), var
+
+
+def error(estimate, exact):
+    """(absolute, relative) error; group errors are the worst group's."""
+    if isinstance(exact, dict):
+        if not isinstance(estimate, dict) or estimate.keys() != exact.keys():
+            return None, None       # some group not seen yet
+        pairs = [error(estimate[k], exact[k]) for k in exact]
+        return max(p[0] for p in pairs), max(p[1] for p in pairs)
+    try:
+        absolute = abs(float(estimate) - exact)
+    except (TypeError, ValueError):
+        return None, None
+    if math.isnan(absolute):
+        return None, None
+    return absolute, absolute / abs(exact) if exact else absolute
+
+
+def summarize(curve, thresholds):
+    """Time and progress after which the relative error stays below each threshold."""
+    summary = {"ticks": len(curve)}
+    if curve:
+        summary["final_abs_error"] = curve[-1][2]
+        summary["final_rel_error"] = curve[-1][3]
+        summary["wall"] = curve[-1][0]
+    for threshold in thresholds:
+        reached = None
+        for elapsed, progress, _, rel in reversed(curve):
+            if rel is None or rel > threshold:
+                break
+            reached = (elapsed, progress)
+        label = f"{threshold:g}"
+        summary[f"time_to_{label}"] = reached[0] if reached else None
+        summary[f"progress_to_{label}"] = reached[1] if reached else None
+    return summary
+
+
+def measure(workload, order, data, interval, scan, thresholds):
+    keys = [row[0] for row in data]
+    xs = [row[1] for row in data]
+    ys = [row[2] for row in data]
+    exact = EXACT[workload](keys, xs, ys)
+
+    program, var = build(workload, data)
+    kwargs = {"interval": interval}
+    if workload == "group_mean":
+        kwargs["scan"] = scan
+
+    curve = []
+    for state in program.run(**kwargs):
+        absolute, relative = error(state.value(var), exact)
+        curve.append((state.elapsed, state.progress, absolute, relative))
+
+    return {
+        "workload": workload,
+        "order": order,
+        "scan": kwargs.get("scan", "sequential"),
+        "rows": len(data),
+        "exact": exact if not isinstance(exact, dict) else {str(k): v for k, v in exact.items()},
+        "summary": summarize(curve, thresholds),
+        "curve": curve,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", help="write JSON here (default: stdout)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.01,
+                        help="tick interval passed to run() (default 0.01)")
+    parser.add_argument("--scan", default="sequential",
+                        choices=("sequential", "stratified"),
+                        help="scan mode for the group workload")
+    parser.add_argument("--workloads", default=",".join(EXACT),
+                        help="comma-separated subset of " + ", ".join(EXACT))
+    parser.add_argument("--orders", default="shuffled,sorted")
+    parser.add_argument("--thresholds", default="0.05,0.01,0.001",
+                        help="relative error thresholds for the summary")
+    parser.add_argument("--no-curves", action="store_true",
+                        help="only write the summaries")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    base = generate(args.rows, args.groups, args.seed)
+
+    results = []
+    for order in args.orders.split(","):
+        data = reorder(base, order, args.seed)
+        for workload in args.workloads.split(","):
+            result = measure(workload, order, data, args.interval, args.scan, thresholds)
+            if args.no_curves:
+                del result["curve"]
+            results.append(result)
+            summary = result["summary"]
+            to_1pct = summary.get("time_to_0.01")
+            print(f"{workload:<12} {order:<9} ticks {summary['ticks']:>4}  "
+                  f"1% error after "
+                  f"{'never' if to_1pct is None else f'{to_1pct:.3f}s'}",
+                  file=sys.stderr)
+
+    write_json({"meta": metadata(), "results": results}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Throughput benchmark for Program.run.
+
+Runs synthetic workloads while varying one dimension at a time around a
+base configuration: row count, number of arrays, number of variables,
+polynomial degree, BQ_special cross terms and group cardinality.  For each
+scenario it reports rows/sec, compile time, time per tick, peak memory
+and the number of arrays and BQs actually read as JSON, and can compare
+the results against a stored baseline::
+
+    python benchmarks/throughput.py --output bench.json
+    python benchmarks/throughput.py --baseline bench.json --tolerance 0.2
+
+The exit status is 1 when a scenario's rows/sec drops by more than the
+tolerance relative to the baseline.
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+
+import pyprogressive as pp
+from pyprogressive import accum, each, group, G
+
+from common import load_json, metadata, run_to_end, scenario_name, write_json
+
+
+BASE = {"rows": 100_000, "arrays": 2, "variables": 2, "degree": 1,
+        "cross": 0, "groups": 0}
+
+SWEEP = {
+    "rows": [10_000, 1_000_000],
+    "arrays": [1, 8],
+    "variables": [8, 32],
+    "degree": [2, 4],
+    "cross": [1, 4],
+    "groups": [10, 10_000],
+}
+
+
+def scenarios(quick=False):
+    """Base configuration plus one-dimension-at-a-time variations.
+
+    Variable-count scenarios get one array per variable (at least the base
+    count), so that their variables do not share BQs.
+    """
+    scale = 10 if quick else 1
+    base = dict(BASE, rows=BASE["rows"] // scale)
+    out = [base]
+    for key, values in SWEEP.items():
+        for value in values:
+            if key == "rows":
+                value //= scale
+            scenario = dict(base, **{key: value})
+            if key == "variables":
+                scenario["arrays"] = max(base["arrays"], value)
+            out.append(scenario)
+    return out
+
+
+def build(params, seed=0):
+    """Create the arrays and compile the program for one scenario."""
+    rng = random.Random(seed)
+    pp.reset()
+    rows = params["rows"]
+    n_vars, degree = params["variables"], params["degree"]
+
+    # All variables use the same degree; variable i sums over the arrays
+    # i, i + variables, ...  With at least as many arrays as variables
+    # (which the "variables" sweep ensures) every variable has BQs of its
+    # own, so the sweep measures accumulation and not deduplicated lookups;
+    # with fewer, variables share an array and its BQs.
+    n_arrays = params["arrays"]
+    arrays = [pp.array([rng.random() for _ in range(rows)])
+              for _ in range(n_arrays)]
+    variables = []
+    for i in range(n_vars):
+        terms = [accum(each(x) ** degree) for x in arrays[i % n_arrays::n_vars]]
+        expr = terms[0]
+        for term in terms[1:]:
+            expr = expr + term
+        variables.append(expr / rows)
+
+    # Cross terms x_a * x_b ** q over distinct array pairs (BQ_special);
+    # they need two arrays.
+    pairs = [(a, b) for a in range(n_arrays) for b in range(a + 1, n_arrays)]
+    for i in range(params["cross"] if pairs else 0):
+        a, b = pairs[i % len(pairs)]
+        q = i // len(pairs) + 1
+        variables.append(accum(each(arrays[a]) * each(arrays[b]) ** q) / rows)
+    if params["groups"]:
+        keyed = pp.array([(rng.randrange(params["groups"]), rng.random())
+                          for _ in range(rows)])
+        variables.append(group(each(keyed, 0), accum(each(G, 1)) / accum(1)))
+
+    return pp.compile(*variables)
+
+
+def measure(params, interval, seed=0, memory=True):
+    program = build(params, seed)
+    gc.collect()
+    state = run_to_end(program, interval=interval, profile=True)
+    summary = program.profile.summary()
+    scan_time = summary["wall"] - summary["phases"]["compile"]
+
+    result = {
+        "name": scenario_name(params),
+        "params": params,
+        "arrays_read": len(program.context.arrays),
+        "bqs": len(program._scan.bq_specs),
+        "rows_per_sec": params["rows"] / scan_time if scan_time > 0 else 0.0,
+        "compile_s": summary["phases"]["compile"],
+        "wall_s": summary["wall"],
+        "ticks": summary["ticks"],
+        "tick_s": scan_time / (summary["ticks"] + 1),
+        "jitter_mean_s": summary.get("jitter_mean", 0.0),
+        "jitter_max_s": summary.get("jitter_max", 0.0),
+        "phases": summary["phases"],
+        "progress": state.progress,
+    }
+
+    if memory:
+        # separate pass: tracemalloc slows the scan down considerably
+        tracemalloc.start()
+        program = build(params, seed)
+        run_to_end(program, interval=interval)
+        result["peak_mem_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Return (name, baseline rows/sec, current rows/sec) for every regression."""
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get(r["name"])
+        if old is None or old["rows_per_sec"] <= 0:
+            continue
+        if r["rows_per_sec"] < old["rows_per_sec"] * (1 - tolerance):
+            regressions.append((r["name"], old["rows_per_sec"], r["rows_per_sec"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", help="write JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative rows/sec drop (default 0.2)")
+    parser.add_argument("--interval", type=float, default=0.1,
+                        help="tick interval passed to run() (default 0.1)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per scenario; the fastest is kept (default 3)")
+    parser.add_argument("--quick", action="store_true",
+                        help="divide row counts by 10")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = []
+    for params in scenarios(args.quick):
+        runs = [measure(params, args.interval, args.seed, memory=False)
+                for _ in range(args.repeat - 1)]
+        runs.append(measure(params, args.interval, args.seed, memory=not args.no_memory))
+        best = max(runs, key=lambda r: r["rows_per_sec"])
+        if "peak_mem_bytes" in runs[-1]:
+            best["peak_mem_bytes"] = runs[-1]["peak_mem_bytes"]
+        results.append(best)
+        print(f"{best['name']}: {best['rows_per_sec']:,.0f} rows/s, "
+              f"compile {best['compile_s']:.3f}s", file=sys.stderr)
+
+    payload = {"meta": metadata(), "results": results}
+    write_json(payload, args.output)
+
+    if args.baseline:
+        regressions = compare(results, load_json(args.baseline), args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:,.0f} -> {new:,.0f} rows/s",
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,15 @@
-from .array import array, reset
+from .array import array, reset, ArraySchema
+from .context import Context
 from .variable import Variable
 from .midlevel import Program, compile, each, accum, group, G
+from .profile import Profiler
+from .explain import QueryPlan
+from .memory import MemoryBudgetExceeded
+from .background import ProgressiveRun
+from .shared import SharedScan
+from .scheduler import Scheduler
+from .sinks import NDJSONSink, CallbackSink, SharedMemoryRing, RingReader
+from .server import ProgressServer
 from . import vis
 
 
@@ -1,28 +1,138 @@
+from array import array as _typed_array
 
+from .context import default_context, current_context
 
-global_arraylist = []
+
+# arrays of the default context (see pp.Context)
+global_arraylist = default_context.arrays
 
 def reset():
-    """Clear all tracked arrays and reset the id counter.
+    """Clear all arrays of the active context and restart its ids.
     Call this at the start of each independent computation to avoid
     leftover arrays from previous cells causing length-mismatch errors.
     Also resets the live vis chart state if pyprogressive.vis is imported.
     """
     import sys
-    global_arraylist.clear()
-    array._id = 0
+    current_context().reset()
     vis = sys.modules.get('pyprogressive.vis')
     if vis is not None:
         vis._live_reset()
 
+
+def _to_column(values):
+    """Store one column in the most compact container that fits its values.
+
+    All-float columns become ``array('d')`` and all-int columns
+    ``array('q')``; anything else (strings, mixed types) stays a list.
+    """
+    if values and all(type(x) is float for x in values):
+        return _typed_array('d', values)
+    if values and all(type(x) is int for x in values):
+        try:
+            return _typed_array('q', values)
+        except OverflowError:
+            pass
+    return values
+
+
+def _column_dtype(column):
+    if isinstance(column, _typed_array):
+        return float if column.typecode == 'd' else int
+    types = {type(x) for x in column}
+    return types.pop() if len(types) == 1 else object
+
+
+class ArraySchema:
+    """Shape and types of an array, inferred once at construction.
+
+    Attributes
+    ----------
+    homogeneous : bool        — every row has the same type (and arity)
+    arity       : int | None  — number of tuple columns, None for scalars
+    dtypes      : list        — Python type per column (object if mixed)
+    """
+
+    def __init__(self, homogeneous, arity, dtypes):
+        self.homogeneous = homogeneous
+        self.arity = arity
+        self.dtypes = dtypes
+
+    @classmethod
+    def infer(cls, columns, tuple_rows):
+        dtypes = [_column_dtype(c) for c in columns]
+        if tuple_rows:
+            return cls(True, len(columns), dtypes)
+        # a scalar column is homogeneous when all its values share one type;
+        # an empty array is trivially homogeneous
+        return cls(dtypes[0] is not object or not len(columns[0]), None, dtypes)
+
+    def __repr__(self):
+        names = ", ".join(t.__name__ for t in self.dtypes)
+        return (f"ArraySchema(homogeneous={self.homogeneous}, "
+                f"arity={self.arity}, dtypes=[{names}])")
+
+
+class _RowView:
+    """Read-only row view over columnar storage.
+
+    Keeps ``arr.data[i]`` working for tuple arrays: rows are rebuilt as
+    tuples on access instead of being stored.
+    """
+
+    def __init__(self, columns):
+        self._columns = columns
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(zip(*(c[i] for c in self._columns)))
+        return tuple(c[i] for c in self._columns)
+
+    def __iter__(self):
+        return zip(*self._columns)
+
+
 class array:
-    _id = 0
-    def __init__(self, data):
+    """Progressive data array.
+
+    Tuple rows such as ``('A', 2)`` are transposed into one column per
+    position at construction, so ``each(arr, k)`` reads column *k* directly.
+    Columns can also be given separately, ``pp.array(keys, values)``, or as
+    a pandas DataFrame.
+    """
+    def __init__(self, data, *columns):
+        if columns:
+            columns = [self._materialise(c) for c in (data, *columns)]
+            if any(len(c) != len(columns[0]) for c in columns):
+                raise ValueError("Columns must have the same length")
+        elif hasattr(data, 'iloc') and hasattr(data, 'columns'):
+            # pandas DataFrame: one column per DataFrame column
+            columns = [data[c].tolist() for c in data.columns]
+        else:
+            data = self._materialise(data)
+            if data and type(data[0]) is tuple and \
+                    all(type(x) is tuple and len(x) == len(data[0]) for x in data):
+                columns = [list(c) for c in zip(*data)]
+            else:
+                columns = [data]
+
+        self.columns = [_to_column(c) for c in columns]
+        self.schema = ArraySchema.infer(self.columns, len(columns) > 1)
+        self.length = len(self.columns[0])
+        self.iter = 0
+        context = current_context()
+        self.id = len(context.arrays)
+        context.arrays.append(self)
+
+    @staticmethod
+    def _materialise(data):
         # Normalize pandas Series/DataFrame columns: their index may be non-contiguous
         # after dropna() or boolean filtering, causing KeyError on integer access.
         if hasattr(data, 'iloc'):
-            data = data.tolist()
-        elif not isinstance(data, list):
+            return data.tolist()
+        if not isinstance(data, list):
             # Accept any iterable (zip, generator, tuple, …) by materialising it.
             data = list(data)
             # Unwrap 1-element tuples produced by zip(single_iterable).
@@ -30,17 +140,33 @@ class array:
             # plain scalars for non-grouped data.
             if data and isinstance(data[0], tuple) and len(data[0]) == 1:
                 data = [x[0] for x in data]
-        self.data = data
-        self.length = len(data)
-        self.iter = 0
-        self.id = array._id
-        global_arraylist.append(self)
-        array._id += 1
+        return data
+
+    @property
+    def arity(self):
+        """Number of tuple columns, or None for scalar (or heterogeneous) arrays."""
+        return self.schema.arity
 
-    
-    def __len__(self):        
+    @property
+    def data(self):
+        """Row access: the values of a scalar array, or tuples rebuilt from columns."""
+        if self.arity is None:
+            return self.columns[0]
+        return _RowView(self.columns)
+
+    def column(self, index=-1):
+        """Return the storage of column *index* (-1: the values of a scalar array)."""
+        if index == -1:
+            if self.arity is not None:
+                raise ValueError("Index is not specified")
+            return self.columns[0]
+        if self.arity is None:
+            raise ValueError("Array must consist of tuples if there is an index")
+        return self.columns[index]
+
+
+    def __len__(self):
         return self.length #DataLengthToken(self)
-    
+
     def __str__(self):
         return "Array_" + str(self.id)
- 
\ No newline at end of file
@@ -0,0 +1,146 @@
+import threading
+
+
+class Mailbox:
+    """Single-slot box holding the latest value; a new value replaces the old.
+
+    The writer never waits for readers: values nobody read before they
+    were replaced are dropped (and counted in ``dropped``).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._value = None
+        self._version = 0
+        self._read = 0          # newest version handed out by take()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, value):
+        with self._cond:
+            if self._version > self._read:
+                self.dropped += 1
+            self._value = value
+            self._version += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """Wake every waiting reader; no more values will arrive."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def peek(self):
+        """Latest value, or None; does not wait."""
+        return self._value
+
+    def take(self, timeout=None):
+        """Wait for a value newer than the last one taken and return it.
+
+        Returns None on timeout, or once the box is closed with nothing new.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > self._read or self.closed, timeout)
+            if self._version <= self._read:
+                return None
+            self._read = self._version
+            return self._value
+
+
+class ProgressiveRun:
+    """A program running on a worker thread, returned by ``program.start()``.
+
+    The worker drives ``program.run()`` at full speed and publishes every
+    IterState into a single-slot :class:`Mailbox`; a slow consumer only
+    ever sees the latest state and never holds up the scan.  ``pause()``,
+    ``resume()`` and ``cancel()`` take effect at the next tick.
+
+    Usage::
+
+        handle = program.start(interval=0.5)
+        for state in handle:          # latest states only, until done
+            ax.line(state.value(mean))
+        # or poll: state = handle.latest
+    """
+
+    def __init__(self, program, **run_options):
+        self.program = program
+        self.mailbox = Mailbox()
+        self.error = None
+        self.cancelled = False
+        self._resume = threading.Event()
+        self._resume.set()
+        self._thread = threading.Thread(target=self._work, args=(run_options,),
+                                        name="pyprogressive-run", daemon=True)
+        self._thread.start()
+
+    def _work(self, run_options):
+        states = self.program.run(**run_options)
+        try:
+            for state in states:
+                self.mailbox.put(state)
+                self._resume.wait()
+                if self.cancelled:
+                    break
+        except BaseException as exc:
+            self.error = exc
+        finally:
+            states.close()
+            self.mailbox.close()
+
+    # -- control ------------------------------------------------------------
+
+    def pause(self):
+        """Stop scanning at the next tick until :meth:`resume`."""
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def cancel(self):
+        """Stop the run at the next tick; the latest state stays available."""
+        self.cancelled = True
+        self._resume.set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def join(self, timeout=None):
+        """Wait for the worker to finish; re-raises an error of the run."""
+        self._thread.join(timeout)
+        self._raise_error()
+
+    # -- results ------------------------------------------------------------
+
+    @property
+    def latest(self):
+        """Most recent IterState (None before the first tick); does not wait."""
+        self._raise_error()
+        return self.mailbox.peek()
+
+    def get(self, timeout=None):
+        """Wait for a state newer than the last one returned by get().
+
+        Returns None on timeout, or when the run ended with nothing new.
+        """
+        state = self.mailbox.take(timeout)
+        self._raise_error()
+        return state
+
+    def __iter__(self):
+        while True:
+            state = self.get()
+            if state is None:
+                return
+            yield state
+            if state.done:
+                return
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
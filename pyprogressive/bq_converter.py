@@ -3,18 +3,19 @@
 import sympy
 from sympy import sympify, simplify, Symbol, expand, Poly, Function, Mul, Pow
 from sympy.core.expr import Expr
-from .sympy_transform import token_map, node_to_sympy_expr
+from .sympy_transform import symbol_table, node_to_sympy_expr, scoped_symbols
 from .expression import (
     Node, BinaryOperationNode, Addition, Subtraction,
     Multiplication, Division, PowerN, BQ, GroupBy
 )
 from .variable import Variable
 from .token import DataItemToken, DataLengthToken, GToken
-from .array import global_arraylist
+from .context import current_context
 
 import re
 
 
+@scoped_symbols
 def convert_with_bq(root_node, BQ_dict):
     """
     Takes a flattened and constantized expression tree (root_node) and interprets the entire expression
@@ -81,8 +82,8 @@ def sympy_to_BQ_node(expr):
     if isinstance(expr, sympy.Symbol):
         name = str(expr)
         if name.startswith("arr_"):
-            if name in token_map:
-                return token_map[name]
+            if name in symbol_table():
+                return symbol_table()[name]
             return DataItemToken()
         
         if name.startswith("BQ_"):
@@ -103,7 +104,7 @@ def sympy_to_BQ_node(expr):
                     return DataLengthToken(arrayid = "constant", ingroup = True)
                 arrayid = int(name.split("_")[1])
     
-                found_array = next((a for a in global_arraylist if a.id == arrayid), None)
+                found_array = next((a for a in current_context().arrays if a.id == arrayid), None)
                 length_val = len(found_array.data) if found_array else None
                 if length_val is None:
                      print(f"Warning: Could not find array with ID {arrayid} during sympy_to_node conversion., this is in group_bq_converter.py")
@@ -116,7 +117,7 @@ def sympy_to_BQ_node(expr):
         if isinstance(expr, DataLengthToken):
             symbol_name = f"DataLength_{expr.arrayid}"
             
-            token_map[symbol_name] = {'type': 'DataLengthToken', 'arrayid': expr.arrayid}
+            symbol_table()[symbol_name] = {'type': 'DataLengthToken', 'arrayid': expr.arrayid}
             return symbol_name
 
         if name.startswith("GToken"):
@@ -202,7 +203,7 @@ def extract_arr_info(expr: Expr):
     if expr.is_Pow:
         base, exponent = expr.as_base_exp()
         if hasattr(base, 'name'):
-            match = re.fullmatch(r'arr_(\d+)', base.name)
+            match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', base.name)
         else:
             return None, None
         if match and exponent.is_Integer:
@@ -210,7 +211,7 @@ def extract_arr_info(expr: Expr):
         return None, None
     # Handle simple symbol: arr_{number}
     if expr.is_Symbol:
-        match = re.fullmatch(r'arr_(\d+)', expr.name)
+        match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', expr.name)
         if match:
             # No exponent specified: we'll treat it as exponent 1 later in division/multiplication
             return match.group(1), None
@@ -263,7 +264,7 @@ def transform_expr(expr: Expr) -> Expr:
     if expr.is_Pow:
         base, exponent = expr.as_base_exp()
         if base.is_Symbol:
-            match = re.fullmatch(r'arr_(\d+)', base.name)
+            match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', base.name)
             if match and exponent.is_Integer:
                 exp_val = exponent if exponent is not None else 1
                 return Mul(1 ,Symbol(f'BQ_{exp_val}_of_{match.group(1)}'))
@@ -281,7 +282,7 @@ def transform_expr(expr: Expr) -> Expr:
     # Keep the original rule: arr_i becomes BQ_1_of_i.
     if expr.is_Symbol:
         if expr.name.startswith("arr_"):
-            match = re.fullmatch(r'arr_(\d+)', expr.name)
+            match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', expr.name)
             if match:
                 return Mul(1, Symbol(f'BQ_1_of_{match.group(1)}'))
     
@@ -0,0 +1,58 @@
+from contextvars import ContextVar
+
+
+class Context:
+    """A session that owns its arrays and their ids.
+
+    ``pp.array()`` registers the new array, and ``pp.compile()`` binds the
+    program, to the active context: the default one unless a ``with
+    ctx:`` block says otherwise.  The active context is held in a
+    ContextVar: asyncio tasks inherit it from the code that created them,
+    but a new ``threading.Thread`` starts in the default context and has
+    to enter *ctx* itself.  A program keeps its context, so it can later
+    run on any thread, and
+    ``pp.reset()`` only clears the active context, so independent queries
+    built in separate contexts can be built and run in parallel::
+
+        ctx = pp.Context()
+        with ctx:
+            arr = pp.array(values)
+            program = pp.compile(accum(each(arr)) / len(arr))
+        for state in program.run():   # any thread, any context
+            ...
+
+    Symbol tables live for one conversion and timers for one run, so they
+    need no owner.
+    """
+
+    def __init__(self):
+        self.arrays = []                # array id -> array
+
+    def get(self, arrid):
+        """The array with id *arrid* (ids are positions in ``arrays``)."""
+        return self.arrays[int(arrid)]
+
+    def reset(self):
+        self.arrays.clear()
+
+    def __enter__(self):
+        # the reset tokens belong to the task/thread that entered, so they
+        # are stacked in a ContextVar of their own (as an immutable tuple,
+        # which tasks created inside the block inherit but cannot change)
+        _tokens.set(_tokens.get() + (_current.set(self),))
+        return self
+
+    def __exit__(self, *exc):
+        tokens = _tokens.get()
+        _tokens.set(tokens[:-1])
+        _current.reset(tokens[-1])
+
+
+default_context = Context()
+_current = ContextVar("pyprogressive_context", default=default_context)
+_tokens = ContextVar("pyprogressive_context_tokens", default=())
+
+
+def current_context():
+    """The active :class:`Context`."""
+    return _current.get()
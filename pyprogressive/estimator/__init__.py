@@ -1 +1 @@
-from .simple_linear_estimator import SimpleLinearEstimator
\ No newline at end of file
+from .simple_linear_estimator import SimpleLinearEstimator
@@ -1,61 +1,84 @@
 import time
-
-def linear_regression(history):
-    x_values = [x for x, y in history]
-    y_values = [y for x, y in history]
-    
-    x_mean = sum(x_values) / len(x_values)
-    y_mean = sum(y_values) / len(y_values)
-    
-    numerator = sum((x - x_mean) * (y - y_mean) for x, y in history)
-    denominator = sum((x - x_mean) ** 2 for x in x_values)
-    m = numerator / denominator
-
-    c = y_mean - m * x_mean
-
-    return m, c
+from collections import deque
 
 class SimpleLinearEstimator:
-    def __init__(self, init_iter_count = 1, min_iter_count = 1):
+    """Predicts how many iterations fit in a time slice.
+
+    Fits ``time = m * iterations + c`` over the last *window* measured
+    batches.  The regression sums are updated incrementally as batches
+    enter and leave the window, so each estimate is O(1).
+
+    Protocol used by ``Program.run()``: ``n = estimate_next(seconds)``,
+    then ``start()``, the batch, and ``end(rows)`` with the rows actually
+    folded (fewer than *n* at the end of the data or when a batch is
+    preempted).
+    """
+    def __init__(self, init_iter_count = 1, min_iter_count = 1, max_iter_count = None, window = 10):
         self.init_iter_count = init_iter_count
         self.min_iter_count = min_iter_count
-        
-        self.history = [] # (iter, time) tuples
+        self.max_iter_count = max_iter_count
+
+        self.history = deque(maxlen=window) # (iter, time) tuples
         self.iter = None
-        
+        # running sums over the window: n, sum x, sum y, sum xy, sum xx
+        self._sums = [0, 0.0, 0.0, 0.0, 0.0]
+
+    def _fit(self):
+        n, sx, sy, sxy, sxx = self._sums
+        denominator = n * sxx - sx * sx
+        if n < 3 or denominator <= 0:
+            return None
+        m = (n * sxy - sx * sy) / denominator
+        c = (sy - m * sx) / n
+        return m, c
+
     def estimate_next(self, tick):
         """ returns the number of iterations to run in ``tick`` seconds"""
         iter = self.init_iter_count
 
-        if len(self.history) > 2:
-            history = self.history[-10:]
-            m, c = linear_regression(history)
-
+        fit = self._fit()
+        if fit is not None and fit[0] > 0:
+            m, c = fit
             iter = (tick - c) / m
+        elif self.history:
+            # too little (or degenerate) history: scale the mean throughput
+            _, sx, sy, _, _ = self._sums
+            if sy > 0:
+                iter = tick * sx / sy
+            else:
+                iter = 2 * self.history[-1][0]
 
         iter = max(self.min_iter_count, int(iter))
-        self.iter = iter    
-            
-        return iter
-        
-    def start(self):
-        self.start_time = time.time()
-
-    def end(self):
-        self.history.append((self.iter, time.time() - self.start_time))
-        self.iter = None
-
-            
-    
-        
-
-        
-
-        
-
-    
+        if self.max_iter_count is not None:
+            iter = min(self.max_iter_count, iter)
+        self.iter = iter
 
+        return iter
 
-    
-
+    def record(self, iter, duration):
+        """Add one measured batch of *iter* iterations taking *duration* seconds."""
+        sums = self._sums
+        if len(self.history) == self.history.maxlen:
+            old_x, old_y = self.history[0]
+            sums[0] -= 1
+            sums[1] -= old_x
+            sums[2] -= old_y
+            sums[3] -= old_x * old_y
+            sums[4] -= old_x * old_x
+        self.history.append((iter, duration))
+        sums[0] += 1
+        sums[1] += iter
+        sums[2] += duration
+        sums[3] += iter * duration
+        sums[4] += iter * iter
 
+    def start(self):
+        self.start_time = time.perf_counter()
+
+    def end(self, iter=None):
+        """Record the batch since :meth:`start`: *iter* iterations (default:
+        the last estimate)."""
+        if iter is None:
+            iter = self.iter
+        self.record(iter, time.perf_counter() - self.start_time)
+        self.iter = None
@@ -0,0 +1,208 @@
+from .evaluator import evaluate
+from .expression import (BQ, GBQ, BinaryOperationNode, InplaceOperationNode, Division,
+                         PowerN, GroupBy)
+from .sympy_transform import node_to_sympy_expr, scoped_symbols
+from .token import DataItemToken
+from .variable import Variable
+
+
+# Rough per-row cost, in arithmetic operations, of each BQ update path:
+# "sum" folds a column slice with the builtin sum, "pow" raises every value
+# first, "mul"/"div" combine two columns (BQ_special cross terms).
+ROW_COST = {"sum": 1, "pow": 2, "mul": 4, "div": 4}
+
+
+def _walk(node):
+    """Yield every node of an expression tree."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, (BinaryOperationNode, InplaceOperationNode)):
+            stack.extend((node.left, node.right))
+        elif isinstance(node, PowerN):
+            stack.extend((node.base, node.exponent))
+        elif isinstance(node, (Variable, GroupBy)):
+            stack.append(node.expr)
+
+
+def _has_estimate(node):
+    return any(isinstance(n, (BQ, GBQ)) for n in _walk(node))
+
+
+def _expression(node):
+    try:
+        return str(scoped_symbols(node_to_sympy_expr)(node))
+    except TypeError:
+        return str(node)
+
+
+def _bq_info(spec):
+    key, operator, _, pow1, _, pow2 = spec
+    parts = key.split("_")
+    if operator is None:
+        path = "sum" if pow1 == 1 else "pow"
+        reads = [parts[3]]
+    else:
+        path = operator
+        reads = [parts[2], parts[6]]
+    return {"name": key, "path": path, "reads": reads, "row_cost": ROW_COST[path]}
+
+
+def _estimate_groups(columns, rows, sample):
+    """``(groups, exact)``: the number of distinct keys, counted when there
+    are at most *sample* rows and otherwise estimated from about *sample*
+    evenly spaced rows (bias-corrected Chao1: the keys seen once and twice
+    tell how many were not seen at all)."""
+    step = max(1, -(-rows // sample)) if sample else rows
+    picks = range(0, rows, step)
+    keys = ([columns[0][i] for i in picks] if len(columns) == 1
+            else [tuple(column[i] for column in columns) for i in picks])
+    counts = {}
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+    if step == 1:
+        return len(counts), True
+    once = sum(1 for c in counts.values() if c == 1)
+    twice = sum(1 for c in counts.values() if c == 2)
+    unseen = once * (once - 1) / (2 * (twice + 1))
+    return min(rows, round(len(counts) + unseen)), False
+
+
+def _key_label(arrid, col):
+    return f"arr {arrid}" if col == -1 else f"arr {arrid}[{col}]"
+
+
+class QueryPlan:
+    """What ``pp.compile()`` generated for a program, returned by
+    ``program.explain()``.
+
+    Lists the BQs updated for every row (with the path each one takes),
+    the group templates, and the expression every variable evaluates at a
+    tick, with a rough cost in arithmetic operations per row and per tick.
+    The program is also run over a small sample so that variables whose
+    evaluation raises (and is therefore reported as NaN) can be flagged
+    together with the statically detected slow or fragile paths.
+
+    Attributes
+    ----------
+    bqs       : list of dict — name, path, reads, row_cost per global BQ
+    groups    : list of dict — per GroupBy variable: keys, groups (distinct
+                keys; estimated from *sample* rows, with groups_exact
+                False, on larger data), templates, expression, row_cost
+    variables : list of dict — per variable: index, kind, expression, tick_cost
+    warnings  : list of (variable index or BQ name, message)
+    row_cost, tick_cost : totals of the estimates above
+    """
+
+    def __init__(self, scan, sample=1000):
+        self.rows = scan.total_len
+        self.bqs = [_bq_info(spec) for spec in scan.bq_specs]
+        self.groups = []
+        self.variables = []
+        self.warnings = []
+
+        for bq in self.bqs:
+            name, path = bq["name"], bq["path"]
+            if path == "div":
+                self.warnings.append((name, "divides per row: a zero divisor aborts the scan "
+                                            "with ZeroDivisionError"))
+            elif "_-" in name:
+                self.warnings.append((name, "negative power per row: a zero value aborts the "
+                                            "scan with ZeroDivisionError"))
+
+        for index, var in enumerate(scan.variables):
+            if isinstance(var, GroupBy):
+                self._add_group(index, scan.plans[id(var)], sample)
+            else:
+                self._add_variable(index, var)
+
+        self._probe(scan, sample)
+        self.row_cost = (sum(bq["row_cost"] for bq in self.bqs)
+                         + sum(g["row_cost"] for g in self.groups))
+        self.tick_cost = sum(v["tick_cost"] for v in self.variables)
+        for group in self.groups:
+            if 2 * group["row_cost"] > self.row_cost:
+                self.warnings.append((group["index"], "group accumulators are updated row "
+                                                      "by row, not in column batches, and "
+                                                      "dominate the per-row cost"))
+
+    def _add_variable(self, index, var):
+        nodes = list(_walk(var.expr))
+        self.variables.append({"index": index, "kind": "scalar",
+                               "expression": _expression(var.expr),
+                               "tick_cost": len(nodes)})
+        if any(isinstance(n, DataItemToken) for n in nodes):
+            self.warnings.append((index, "data term outside accum(): it cannot be lowered "
+                                         "to a BQ and the variable evaluates to NaN"))
+        if any(isinstance(n, Division) and _has_estimate(n.right) for n in nodes):
+            self.warnings.append((index, "divides by an estimate: NaN while the divisor "
+                                         "is still zero"))
+        if any(isinstance(n, PowerN) and not isinstance(n.exponent, int)
+               and _has_estimate(n.base) for n in nodes):
+            self.warnings.append((index, "fractional power of an estimate: NaN or complex "
+                                         "while the base is negative"))
+
+    def _add_group(self, index, plan, sample):
+        columns = plan.encoder.columns
+        groups, exact = _estimate_groups(columns, self.rows, sample)
+        template_cost = sum(1 for _ in _walk(plan.expr))
+        # encode (one lookup per key column) + count, then one running mean per GBQ
+        row_cost = len(columns) + 1 + 3 * len(plan.gbq_specs)
+        self.groups.append({
+            "index": index,
+            "keys": [_key_label(arrid, col) for arrid, col in plan.keys],
+            "groups": groups,
+            "groups_exact": exact,
+            "templates": [(name, degree) for name, degree, _ in plan.gbq_specs],
+            "expression": _expression(plan.expr),
+            "row_cost": row_cost,
+        })
+        self.variables.append({"index": index, "kind": "group",
+                               "expression": _expression(plan.expr),
+                               "tick_cost": template_cost * groups})
+
+    def _probe(self, scan, sample):
+        """Evaluate every scalar variable after a short scan and record failures."""
+        scan.step(min(sample, scan.total_len))
+        for index, var in enumerate(scan.variables):
+            if isinstance(var, GroupBy):
+                continue
+            try:
+                evaluate(var, scan.BQ_dict, length=scan.total_len)
+            except Exception as exc:
+                self.warnings.append((index, f"evaluation raised {type(exc).__name__} after "
+                                             f"{scan.pos} rows: ticks report NaN"))
+
+    def report(self):
+        """Human-readable plan."""
+        lines = [f"query plan: {len(self.variables)} variables over {self.rows} rows", ""]
+        if self.bqs:
+            lines.append(f"{'base quantity':<40}{'path':<6}{'reads':<12}{'ops/row':>8}")
+            for bq in self.bqs:
+                lines.append(f"{bq['name']:<40}{bq['path']:<6}"
+                             f"{', '.join(bq['reads']):<12}{bq['row_cost']:>8}")
+            lines.append("")
+        for group in self.groups:
+            groups = group["groups"] if group["groups_exact"] else f"~{group['groups']}"
+            lines.append(f"group var {group['index']}: keys {', '.join(group['keys'])}, "
+                         f"{groups} groups, {group['row_cost']} ops/row")
+            for name, degree in group["templates"]:
+                lines.append(f"  {name} (degree {degree})")
+            lines.append("")
+        lines.append(f"{'var':<5}{'kind':<8}{'ops/tick':>9}  expression")
+        for var in self.variables:
+            lines.append(f"{var['index']:<5}{var['kind']:<8}{var['tick_cost']:>9}  "
+                         f"{var['expression']}")
+        lines.append("")
+        lines.append(f"estimated cost: {self.row_cost} ops/row, {self.tick_cost} ops/tick")
+        if self.warnings:
+            lines.append("")
+            lines.append("slow or fragile paths:")
+            for where, message in self.warnings:
+                label = f"var {where}" if isinstance(where, int) else where
+                lines.append(f"  {label}: {message}")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.report()
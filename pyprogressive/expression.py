@@ -116,9 +116,11 @@ class GBQ(Node):
         return self.name
 
 class GroupBy(Node):
-    def __init__(self, group_index, array_index, expr, group_BQ_dict=None):
+    def __init__(self, group_index, array_index, expr, group_BQ_dict=None, keys=None):
         self.group_index = group_index
         self.array_index = array_index
+        # [(array_id, column)] for every key column; one entry unless composite
+        self.keys = keys if keys is not None else [(array_index, group_index)]
         self.group_length_dict = {}
         self.group_BQ_dict = {}
         self.expr = expr
@@ -1,18 +1,19 @@
 import sympy
 from sympy import sympify, simplify, Symbol, expand, Mul
 from sympy.core.expr import Expr
-from .sympy_transform import token_map, node_to_sympy_expr
+from .sympy_transform import symbol_table, node_to_sympy_expr, scoped_symbols
 from .expression import (
     Node, BinaryOperationNode, Addition, Subtraction,
     Multiplication, Division, PowerN, BQ, GroupBy, GBQ
 )
 from .variable import Variable
 from .token import DataItemToken, DataLengthToken, GToken
-from .array import global_arraylist
+from .context import current_context
 
 import re
 
 
+@scoped_symbols
 def group_convert_with_bq(root_node, BQ_dict):
     """
     Takes a flattened and constantized expression tree (root_node) and interprets the entire expression
@@ -55,8 +56,8 @@ def sympy_to_BQ_node(expr):
     if isinstance(expr, sympy.Symbol):
         name = str(expr)
         if name.startswith("arr_"):
-            if name in token_map:
-                return token_map[name]
+            if name in symbol_table():
+                return symbol_table()[name]
             return DataItemToken()
         
         if name.startswith("BQ_") or name.startswith("GBQ_"):
@@ -67,10 +68,13 @@ def sympy_to_BQ_node(expr):
             else:
                 bqnum = name.split("_")[1]
                 col_str = name.split("_")[-1]
-                try:
-                    col = int(col_str)
-                except ValueError:
-                    col = 1  # legacy "idx" fallback
+                if col_str.startswith("a"):
+                    col = col_str  # values from a separate array (each(G, arr))
+                else:
+                    try:
+                        col = int(col_str)
+                    except ValueError:
+                        col = 1  # legacy "idx" fallback
                 return GBQ(bqnum, col, 1, name)
         
 
@@ -82,7 +86,7 @@ def sympy_to_BQ_node(expr):
                     return DataLengthToken(arrayid = "constant", ingroup = True)
                 arrayid = int(name.split("_")[1])
 
-                found_array = next((a for a in global_arraylist if a.id == arrayid), None)
+                found_array = next((a for a in current_context().arrays if a.id == arrayid), None)
                 length_val = len(found_array.data) if found_array else None
                 if length_val is None:
                      print(f"Warning: Could not find array with ID {arrayid} during sympy_to_node conversion., this is in group_bq_converter.py")
@@ -172,7 +176,7 @@ def extract_arr_info(expr: Expr):
     if expr.is_Pow:
         base, exponent = expr.as_base_exp()
         if hasattr(base, 'name'):
-            match = re.fullmatch(r'arr_(\d+)', base.name)
+            match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', base.name)
         else:
             return None, None
         if match and exponent.is_Integer:
@@ -180,7 +184,7 @@ def extract_arr_info(expr: Expr):
         return None, None
     # Handle simple symbol: arr_{number}
     if expr.is_Symbol:
-        match = re.fullmatch(r'arr_(\d+)', expr.name)
+        match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', expr.name)
         if match:
             # No exponent specified: we'll treat it as exponent 1 later in division/multiplication
             return match.group(1), None
@@ -239,7 +243,7 @@ def transform_expr(expr: Expr) -> Expr:
         
         # 기존: base가 "arr_<number>" 인 경우 처리 (예: arr_1**2 -> BQ_2_of_1)
         if base.is_Symbol:
-            match = re.fullmatch(r'arr_(\d+)', base.name)
+            match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', base.name)
             if match and exponent.is_Integer:
                 exp_val = int(exponent)
                 return Mul(1, Symbol(f'BQ_{exp_val}_of_{match.group(1)}'))
@@ -256,7 +260,7 @@ def transform_expr(expr: Expr) -> Expr:
             return Mul(1, Symbol(f"GBQ_1_of_{col}"))
         # 기존: "arr_<number>" 형태 처리 (예: arr_1 -> BQ_1_of_1)
         if expr.name.startswith("arr_"):
-            match = re.fullmatch(r'arr_(\d+)', expr.name)
+            match = re.fullmatch(r'arr_(\d+(?:c\d+)?)', expr.name)
             if match:
                 return Mul(1, Symbol(f'BQ_1_of_{match.group(1)}'))
     
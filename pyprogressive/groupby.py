@@ -1,142 +1,273 @@
 from .expression import Node, GroupBy, InplaceOperationNode, BinaryOperationNode, BQ, Addition, Subtraction, Multiplication, Division, PowerN
 from .variable import Variable
 from .group_bq_converter import group_convert_with_bq
-from .array import array, global_arraylist
+from .array import array
+from .context import current_context
 from .token import DataItemToken, DataLengthToken, GToken
 
 
-def detect_group_bq(expr, BQ_dict, idx):
-    if isinstance(expr, GroupBy):
-        group_index = expr.group_index
-        array_index = expr.array_index
-        array = global_arraylist[array_index]
-        item = array.data[idx]
-        group_key = item if group_index == -1 else item[group_index]
-        BQ_str_grouplength_rate = "BQ_grouplength_"+str(group_key)+"_lengthrate_of_"+str(array_index)
-        BQ_str_eval = "BQ_group_"+str(group_key)+"_"
-        BQ_str_dict = {}
-
-        _, BQ_str_dict = group_convert_with_bq(expr.expr, BQ_str_dict)
-
-        # Store key-column metadata so group_by_bq_update can use the right column
-        BQ_dict[f"META_groupindex_of_{array_index}"] = group_index
-
-        for key in BQ_str_dict.keys():
-            if key.startswith("GBQ"):
-                num = key.split("_")[1]
-                col_str = key.split("_")[-1]
-                try:
-                    val_col = int(col_str)
-                except ValueError:
-                    val_col = 1  # legacy fallback
-                tem = BQ_str_eval + "GBQ_" + str(num) + "_of_" + str(array_index)
-                if tem not in BQ_dict:
-                    BQ_dict[tem] = 0
-                # Store value-column metadata for this GBQ key
-                BQ_dict[f"META_col_{tem}"] = val_col
-            else:
-                tem = BQ_str_eval + key
-                if tem not in BQ_dict:
-                    BQ_dict[tem] = 0
-
-        if BQ_str_grouplength_rate not in BQ_dict:
-            BQ_dict[BQ_str_grouplength_rate] = 0
-
-        return BQ_dict
-
-
-def group_by_bq_update(BQ_dict, idx):
-
-    for key in BQ_dict.keys():
-        key_str = key.split("_")
-        if key.startswith("BQ_grouplength"):
-            using_array_idx = key_str[-1]
-            using_array = global_arraylist[int(using_array_idx)]
-            item = using_array.data[idx]
-            group_index = BQ_dict.get(f"META_groupindex_of_{using_array_idx}", 0)
-            group_key = str(item) if not isinstance(item, tuple) else str(item[group_index])
-            if key_str[2] == group_key:
-                BQ_dict[key] = (BQ_dict[key] * idx + 1) / (idx + 1)
-            else:
-                BQ_dict[key] = BQ_dict[key] * idx / (idx + 1)
-
-    for key in BQ_dict.keys():
-        if not key.startswith("BQ_group"):
+# Bits reserved for each key column inside a composite group code.
+_CODE_BITS = 32
+_CODE_MASK = (1 << _CODE_BITS) - 1
+
+
+class GroupKeyEncoder:
+    """Encodes the (possibly composite) group key of a row as one integer.
+
+    Every key column keeps its own value -> code table, and the per-column
+    codes of a row are packed into a single int.  A composite key therefore
+    costs one dict lookup per column instead of building a tuple per row,
+    and the accumulators are keyed by plain ints whatever the key width.
+    """
+
+    def __init__(self, keys):
+        # keys: [(array_id, column)] — column -1 means a scalar array
+        self.keys = keys
+        context = current_context()
+        self.columns = [context.get(arrid).column(col) for arrid, col in keys]
+        self.values = [[] for _ in keys]   # per column: code -> value
+        self.codes = [{} for _ in keys]    # per column: value -> code
+
+    def _column_code(self, k, value):
+        codes = self.codes[k]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[k])
+            self.values[k].append(value)
+        return code
+
+    def encode(self, idx):
+        code = 0
+        for k, column in enumerate(self.columns):
+            code = (code << _CODE_BITS) | self._column_code(k, column[idx])
+        return code
+
+    def decode(self, code):
+        """Return the original key value (a tuple for composite keys)."""
+        if len(self.keys) == 1:
+            return self.values[0][code]
+        parts = []
+        for k in range(len(self.keys) - 1, -1, -1):
+            parts.append(self.values[k][code & _CODE_MASK])
+            code >>= _CODE_BITS
+        return tuple(reversed(parts))
+
+
+def parse_gbq_source(name):
+    """Split ``GBQ_<degree>_of_<source>`` into (degree, source).
+
+    *source* is an int column of the grouped array, or ``("array", id)``
+    when the values come from a separate aligned array (``each(G, arr)``).
+    """
+    parts = name.split("_")
+    degree, src = int(parts[1]), parts[-1]
+    if src.startswith("a"):
+        return degree, ("array", int(src[1:]))
+    try:
+        return degree, int(src)
+    except ValueError:
+        return degree, 1  # legacy fallback
+
+
+class GroupPlan:
+    """Compiled form of one GroupBy variable for one scan.
+
+    Holds the lowered expression, the key encoder (with its value tables)
+    and the GBQ update specs.  Every scan compiles its own plan, so the
+    user's GroupBy is never modified and concurrent runs of the same
+    variable do not share encoders.
+    """
+
+    def __init__(self, var, expr, encoder, rows, gbq_specs):
+        self.var = var
+        self.keys = var.keys
+        self.array_index = var.array_index
+        self.expr = expr
+        self.encoder = encoder
+        self.rows = rows
+        self.gbq_specs = gbq_specs   # [(GBQ name, degree, value column)]
+
+
+def compile_group(var):
+    """Lower the expression of a GroupBy once into a :class:`GroupPlan`.
+
+    Returns ``(plan, bq_names)``, *bq_names* being the normal (ungrouped)
+    BQs the group expression refers to, so that the caller can accumulate
+    them globally.
+    """
+    expr, bq_names = group_convert_with_bq(var.expr, {})
+
+    context = current_context()
+    grouped = context.get(var.array_index)
+    gbq_specs = []
+    for name in sorted(bq_names):
+        if not name.startswith("GBQ"):
             continue
-        key_str = key.split("_")
-        using_array_idx = key_str[-1]
-        using_array = global_arraylist[int(using_array_idx)]
-        item = using_array.data[idx]
-        group_index = BQ_dict.get(f"META_groupindex_of_{using_array_idx}", 0)
-        group_key = str(item) if not isinstance(item, tuple) else str(item[group_index])
-        if key_str[1] == "group" and key_str[2] == group_key:
-            degree, compute_arr = key_str[4], key_str[6]
-            target_arr = None
-            for arr in global_arraylist:
-                if arr.id == int(compute_arr):
-                    target_arr = arr
-            if target_arr is None:
-                raise ValueError("Array not found")
-
-            # Look up actual value column from metadata (set by detect_group_bq)
-            val_col = BQ_dict.get(f"META_col_{key}", None)
-            if val_col is not None:
-                # GBQ key: value comes from item[val_col] of the grouped array
-                val = item if not isinstance(item, tuple) else item[val_col]
-            else:
-                # Non-GBQ key: value comes from target array (legacy path)
-                target_item = target_arr.data[idx]
-                val = target_item if not isinstance(target_item, tuple) else target_item[1]
-
-            category = key_str[2]
-            category_lengthrate = BQ_dict["BQ_grouplength_" + category + "_lengthrate_of_" + str(compute_arr)]
-            category_length = category_lengthrate * (idx + 1)
-            BQ_dict[key] = (BQ_dict[key] * (category_length - 1) + val ** int(degree)) / category_length
-
-    return BQ_dict
+        degree, src = parse_gbq_source(name)
+        if isinstance(src, tuple):
+            gbq_specs.append((name, degree, context.get(src[1]).column()))
+        else:
+            gbq_specs.append((name, degree, grouped.column(src)))
+
+    plan = GroupPlan(var, expr, GroupKeyEncoder(var.keys), len(grouped), gbq_specs)
+    return plan, [name for name in bq_names if name.startswith("BQ_")]
+
+
+# Rows a group must have folded in before its interval may freeze it.
+_FREEZE_MIN_ROWS = 30
+
+
+def new_group_dict(plan, moments=False, freeze=False):
+    """Empty accumulator state for *plan*: symbol name -> {group code: value}.
+
+    *moments* adds per-group second moments (``"M2"``) for confidence
+    intervals; *freeze* adds the set of frozen groups and the number of
+    rows actually folded into each group's means (``"used"``).
+    """
+    BQ_group_dict = {"length": {}, "rows": plan.rows}
+    for name, _, _ in plan.gbq_specs:
+        BQ_group_dict[name] = {}
+    if moments:
+        BQ_group_dict["M2"] = {name: {} for name, _, _ in plan.gbq_specs}
+    if freeze:
+        BQ_group_dict["frozen"] = set()
+        BQ_group_dict["used"] = {}
+    return BQ_group_dict
+
+
+def group_by_bq_update(plan, BQ_group_dict, idx):
+    """Fold row *idx* into the accumulators of the group it belongs to."""
+    code = plan.encoder.encode(idx)
+    lengths = BQ_group_dict["length"]
+    n = lengths.get(code, 0) + 1
+    lengths[code] = n
+
+    frozen = BQ_group_dict.get("frozen")
+    if frozen is not None:
+        # frozen groups keep counting rows (for their size) but stop updating
+        if code in frozen:
+            return BQ_group_dict
+        used = BQ_group_dict["used"]
+        n = used[code] = used.get(code, 0) + 1
+
+    moments2 = BQ_group_dict.get("M2")
+    for name, degree, values in plan.gbq_specs:
+        val = values[idx] ** degree
+        means = BQ_group_dict[name]
+        mean = means.get(code, 0)
+        means[code] = mean + (val - mean) / n
+        if moments2 is not None:
+            squares = moments2[name]
+            m2 = squares.get(code, 0)
+            squares[code] = m2 + (val * val - m2) / n
+
+    return BQ_group_dict
+
+
+def group_intervals(plan, BQ_group_dict, z, index, total_len, normal_BQ_dict=None):
+    """Confidence half-width of every group's value: {group code: width}.
+
+    Each GBQ mean gets a standard error from its second moment, with a
+    finite-population correction for the share of the group already read,
+    and the errors are propagated through the group expression to first
+    order (delta method, covariances between GBQs ignored).
+    """
+    lengths = BQ_group_dict["length"]
+    used = BQ_group_dict.get("used", lengths)
+    sizes = BQ_group_dict.get("size")
+    moments2 = BQ_group_dict["M2"]
+    processed = index + 1
+
+    widths = {}
+    for code, n in used.items():
+        size = sizes[code] if sizes is not None else lengths[code] * total_len / processed
+        fpc = 1 - n / size
+        if fpc <= 0:
+            widths[code] = 0.0
+            continue
+        value = group_evaluator(plan.expr, BQ_group_dict, code, index,
+                                plan.array_index, normal_BQ_dict)
+        variance = 0.0
+        for name, _, _ in plan.gbq_specs:
+            means = BQ_group_dict[name]
+            mean = means[code]
+            se2 = max(moments2[name][code] - mean * mean, 0.0) / n * fpc
+            if se2 == 0:
+                continue
+            step = se2 ** 0.5
+            means[code] = mean + step
+            try:
+                shifted = group_evaluator(plan.expr, BQ_group_dict, code, index,
+                                          plan.array_index, normal_BQ_dict)
+            finally:
+                means[code] = mean
+            slope = (shifted - value) / step
+            variance += slope * slope * se2
+        widths[code] = z * variance ** 0.5
+    return widths
+
+
+def freeze_groups(BQ_group_dict, widths, tol):
+    """Freeze every group whose half-width is at most *tol*; returns the frozen set."""
+    frozen = BQ_group_dict["frozen"]
+    used = BQ_group_dict["used"]
+    for code, width in widths.items():
+        if width <= tol and used[code] >= _FREEZE_MIN_ROWS:
+            frozen.add(code)
+    return frozen
+
+
+def group_is_local(plan, BQ_group_dict):
+    """True if a group's value can only change when rows are folded into it.
+
+    Values that read global BQs, or group sizes estimated from the scan
+    position, drift for every group on every tick.
+    """
+    sizes_known = "size" in BQ_group_dict
+    stack = [plan.expr]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (int, float)):
+            continue
+        if isinstance(node, DataLengthToken):
+            ingroup = node.arrayid == "GToken" or (node.arrayid == "constant" and node.ingroup)
+            if ingroup and not sizes_known:
+                return False
+            continue
+        if str(node).startswith("BQ_"):
+            return False
+        for attr in ("left", "right", "base", "exponent", "expr"):
+            child = getattr(node, attr, None)
+            if child is not None:
+                stack.append(child)
+    return True
 
 
 def group_evaluator(var, BQ_group_dict, category=None, index=None, gindex=None, normal_BQ_dict=None):
     node = var
-    if isinstance(node, GroupBy):
-        categoryies = set()
+    if isinstance(node, GroupPlan):
         category_values = {}
-        for key in BQ_group_dict.keys():
-            if key.startswith("BQ_group"):
-                categoryies.add(key.split("_")[2])
-
-        for target_category in categoryies:
-            category_values[target_category] = group_evaluator(
+        for code in BQ_group_dict["length"]:
+            category_values[node.encoder.decode(code)] = group_evaluator(
                 node.expr, BQ_group_dict,
-                category=target_category, gindex=gindex,
+                category=code, index=index, gindex=gindex,
                 normal_BQ_dict=normal_BQ_dict,
             )
-
-        node.val = category_values
         return category_values
 
     if isinstance(node, (int, float)):
         return node
 
     if isinstance(node, DataLengthToken):
-        if node.arrayid == "GToken":
-            target = "BQ_grouplength_"+str(category)+"_lengthrate_of_"+str(gindex)
-            return BQ_group_dict[target] * len(global_arraylist[0])
-        elif node.arrayid == "constant":
-            target = "BQ_grouplength_"+str(category)+"_lengthrate_of_"+str(gindex)
-            if node.ingroup:
-                return BQ_group_dict[target] * len(global_arraylist[0])
-            else:
-                return len(global_arraylist[0])
-        else:
-            target = "BQ_grouplength_"+str(category)+"_lengthrate_of_"+str(node.arrayid)
-
-        if target not in BQ_group_dict:
-            raise ValueError("Array not found")
-        return len(global_arraylist[0])
-
-    if isinstance(node, DataItemToken):
-        pass
+        if node.arrayid == "GToken" or (node.arrayid == "constant" and node.ingroup):
+            sizes = BQ_group_dict.get("size")
+            if sizes is not None:
+                # stratified scans index every group up front: sizes are exact
+                return sizes[category]
+            # estimated group size = observed share of the group * total length
+            rate = BQ_group_dict["length"][category] / (index + 1)
+            return rate * BQ_group_dict["rows"]
+        return BQ_group_dict["rows"]
 
     node_str = str(node)
     if node_str.startswith("BQ_"):
@@ -144,28 +275,26 @@ def group_evaluator(var, BQ_group_dict, category=None, index=None, gindex=None,
     elif node_str.startswith("GBQ_"):
         if category is None:
             raise ValueError("Category is None")
-        number = node_str.split("_")[1]
-        target = "BQ_group_"+str(category)+"_GBQ_"+str(number)+"_of_"+str(gindex)
-        return BQ_group_dict[target]
+        return BQ_group_dict[node_str][category]
 
     if isinstance(node, Addition):
-        return (group_evaluator(node.left,  BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict) +
-                group_evaluator(node.right, BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict))
+        return (group_evaluator(node.left,  BQ_group_dict, category, index, gindex, normal_BQ_dict) +
+                group_evaluator(node.right, BQ_group_dict, category, index, gindex, normal_BQ_dict))
     elif isinstance(node, Subtraction):
-        return (group_evaluator(node.left,  BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict) -
-                group_evaluator(node.right, BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict))
+        return (group_evaluator(node.left,  BQ_group_dict, category, index, gindex, normal_BQ_dict) -
+                group_evaluator(node.right, BQ_group_dict, category, index, gindex, normal_BQ_dict))
     elif isinstance(node, Multiplication):
-        return (group_evaluator(node.left,  BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict) *
-                group_evaluator(node.right, BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict))
+        return (group_evaluator(node.left,  BQ_group_dict, category, index, gindex, normal_BQ_dict) *
+                group_evaluator(node.right, BQ_group_dict, category, index, gindex, normal_BQ_dict))
     elif isinstance(node, Division):
-        return (group_evaluator(node.left,  BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict) /
-                group_evaluator(node.right, BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict))
+        return (group_evaluator(node.left,  BQ_group_dict, category, index, gindex, normal_BQ_dict) /
+                group_evaluator(node.right, BQ_group_dict, category, index, gindex, normal_BQ_dict))
     elif isinstance(node, PowerN):
-        return (group_evaluator(node.base,     BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict) **
-                group_evaluator(node.exponent, BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict))
+        return (group_evaluator(node.base,     BQ_group_dict, category, index, gindex, normal_BQ_dict) **
+                group_evaluator(node.exponent, BQ_group_dict, category, index, gindex, normal_BQ_dict))
 
     if hasattr(node, "expr"):
-        return group_evaluator(node.expr, BQ_group_dict, category, gindex=gindex, normal_BQ_dict=normal_BQ_dict)
+        return group_evaluator(node.expr, BQ_group_dict, category, index, gindex, normal_BQ_dict)
 
     if hasattr(node, "value") and callable(node.value):
         return node.value()
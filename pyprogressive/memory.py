@@ -0,0 +1,85 @@
+import sys
+
+from .context import current_context
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised by ``Program.run(memory_budget=...)`` when the run outgrows its budget.
+
+    ``report`` holds the :func:`memory_report` that broke the budget.
+    """
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def sizeof_column(column):
+    """Bytes held by one array column, values included.
+
+    Typed columns store their values inline; list columns hold references,
+    so every distinct value object is counted once.
+    """
+    size = sys.getsizeof(column)
+    if isinstance(column, list):
+        seen = set()
+        for value in column:
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+    return size
+
+
+def sizeof_array(arr):
+    return sum(sizeof_column(column) for column in arr.columns)
+
+
+def sizeof_state(obj):
+    """Bytes held by nested accumulator containers (dicts, lists, sets, tuples)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += sys.getsizeof(key) + sizeof_state(value)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(sizeof_state(value) for value in obj)
+    return size
+
+
+def _vis_memory():
+    vis = sys.modules.get('pyprogressive.vis')
+    if vis is None or not hasattr(vis, '_live_memory'):
+        return 0
+    return vis._live_memory()
+
+
+def memory_report(scan=None, array_sizes=None, context=None):
+    """Approximate bytes held per component, as a dict.
+
+    ``arrays``  : {array id: bytes} of the ``pp.array`` storage
+    ``bq``      : global BQ running means of *scan*
+    ``groups``  : {variable index: bytes} of the per-group accumulators
+    ``vis``     : history of the active live figure
+    ``total``   : sum of the above
+
+    *array_sizes* reuses array sizes measured earlier; the data does not
+    change during a run, and measuring list columns is O(rows).  The
+    arrays are those of *context* (default: the active one).
+    """
+    if array_sizes is None:
+        context = context if context is not None else current_context()
+        array_sizes = {arr.id: sizeof_array(arr) for arr in context.arrays}
+    report = {
+        "arrays": dict(array_sizes),
+        "bq": 0,
+        "groups": {},
+        "vis": _vis_memory(),
+    }
+    if scan is not None:
+        report["bq"] = sizeof_state(scan.BQ_dict)
+        if scan.stratified is not None:
+            report["bq"] += sizeof_state(scan.stratified.means)
+        for var in scan.groups:
+            report["groups"][scan.var_index[id(var)]] = sizeof_state(scan.BQ_group_dicts[id(var)])
+    report["total"] = (sum(report["arrays"].values()) + report["bq"]
+                       + sum(report["groups"].values()) + report["vis"])
+    return report
@@ -1,5 +1,9 @@
+import asyncio
 import sys
 import time
+import warnings
+from itertools import islice
+from statistics import NormalDist
 
 from .token import SpecialToken
 from .variable import Variable
@@ -7,23 +11,38 @@ from .expression import (Node, Addition, Subtraction, Multiplication, Division,
                          PowerN, InplaceAddition, InplaceSubtraction,
                          InplaceMultiplication, InplaceDivision, BQ, GroupBy,
                          BinaryOperationNode, InplaceOperationNode)
-from .token import DataItemToken, DataLengthToken, GToken, global_G_arridx
-from .array import array, global_arraylist
+from .token import DataItemToken, DataLengthToken, GToken
+from .array import array
+from .context import current_context
 from .bq_converter import convert_with_bq
 from .group_bq_converter import group_convert_with_bq
 from .sympy_transform import flatten_with_sympy
 from .evaluator import evaluate
-from .groupby import group_by_bq_update, group_evaluator, detect_group_bq
+from .groupby import (compile_group, new_group_dict, group_by_bq_update, group_evaluator,
+                      group_intervals, freeze_groups, group_is_local)
 from .elapsed import Elapsed
+from .sampling import stratify, interleave, StratifiedMeans
+from .estimator import SimpleLinearEstimator
+from .profile import Profiler
+from .explain import QueryPlan
+from .memory import memory_report, sizeof_array, MemoryBudgetExceeded
+from .background import ProgressiveRun
 
 G = GToken()
-elapsed = Elapsed()
+_END = object()   # end-of-run marker for arun()
 
 
 # ---------------------------------------------------------------------------
 # IterState — snapshot of one tick's results
 # ---------------------------------------------------------------------------
 
+def _plain(value):
+    """A variable's value with group keys as strings, for JSON."""
+    if isinstance(value, dict):
+        return {str(key): _plain(v) for key, v in value.items()}
+    return value
+
+
 class IterState:
     """Yielded by Program.run() on each interval tick.
 
@@ -32,25 +51,132 @@ class IterState:
     done     : bool   — True on the final yield (all data processed)
     t        : float  — elapsed seconds so far
     progress : float  — fraction complete (0.0 – 1.0)
+    eta      : float  — predicted seconds until done (0.0 when done, None
+                        until a throughput has been measured)
+    jitter   : float  — seconds this tick came after its deadline (negative
+                        if early; None for the final state)
+    keyframe : bool   — False if GroupBy results are stored as changes since
+                        the previous state (``run(delta=...)``)
+    profile  : dict   — per-phase timings so far (None unless run(profile=True))
     """
 
-    def __init__(self, results, elapsed_obj, var_index):
+    def __init__(self, results, elapsed_obj, var_index, intervals=None, frozen=None,
+                 profile=None, eta=None, jitter=None, prev=None, delta=None):
         self._results   = list(results)   # shallow copy — results list is reused
+        self._delta     = delta           # indices whose result is a delta, or None
+        self._prev      = prev            # state the deltas apply to
+        self._full      = {}              # index -> materialized delta result
+        self.keyframe   = delta is None
         self._var_index = var_index
+        self._intervals = intervals       # per variable: {key: (lo, hi)} or None
+        self._frozen    = frozen          # per variable: set of frozen keys or None
+        self.profile    = profile
+        self.eta        = eta
+        self.jitter     = jitter
         self.done       = elapsed_obj.done
         self.elapsed    = elapsed_obj.elapsed()
         self.progress   = (elapsed_obj.current / elapsed_obj.total
                            if elapsed_obj.total > 0 else 0.0)
 
-    def value(self, var):
-        """Return the current progressive estimate for *var*."""
+    def _index(self, var):
         idx = self._var_index.get(id(var))
         if idx is None:
             raise KeyError(
                 "Variable not found in program — "
                 "did you forget to pass it to pp.compile()?"
             )
-        return self._results[idx]
+        return idx
+
+    def value(self, var):
+        """Return the current progressive estimate for *var*."""
+        return self._value_at(self._index(var))
+
+    def changes(self, var):
+        """Entries of GroupBy *var* that changed since the previous state.
+
+        Only meaningful for runs with ``delta=...``: on a keyframe (and in
+        runs without deltas) this is the full result.
+        """
+        idx = self._index(var)
+        if self._delta is not None and idx in self._delta:
+            return self._results[idx]
+        return self._value_at(idx)
+
+    def _value_at(self, idx):
+        if self._delta is None or idx not in self._delta:
+            return self._results[idx]
+        full = self._full.get(idx)
+        if full is None:
+            # walk back to the keyframe (or a materialized state), then
+            # replay the deltas forward
+            chain, state = [], self
+            while state._delta is not None and idx in state._delta and idx not in state._full:
+                chain.append(state)
+                state = state._prev
+            base = state._full[idx] if idx in state._full else state._results[idx]
+            full = dict(base)
+            for state in reversed(chain):
+                full.update(state._results[idx])
+            self._full[idx] = full
+            if len(self._full) == len(self._delta):
+                self._prev = None   # self-contained now: let the chain go
+        return full
+
+    def interval(self, var):
+        """Return ``{key: (lo, hi)}`` confidence intervals for GroupBy *var*.
+
+        Only available when the program runs with ``confidence=...``.
+        """
+        idx = self._index(var)
+        if self._intervals is None or self._intervals[idx] is None:
+            raise ValueError(
+                "No intervals for this variable — run a GroupBy program "
+                "with confidence=..."
+            )
+        return self._intervals[idx]
+
+    def to_dict(self, names=None, changes=False):
+        """JSON-ready record of this state.
+
+        Keys: ``elapsed``, ``progress``, ``done``, ``eta``, ``jitter``,
+        ``keyframe`` and ``values`` — ``{name: value}`` in compile order,
+        named by *names* (default ``v0``, ``v1``, ...), group keys as
+        strings — plus ``intervals`` (``{name: {key: [lo, hi]}}``) when
+        available.
+
+        With *changes*, GroupBy values of a non-keyframe state only hold
+        the entries that changed since the previous state (see
+        :meth:`changes`) instead of the full result, which spares the
+        copy; a reader rebuilds the full values by merging every record
+        into the last one with ``"keyframe": true``.
+        """
+        if names is None:
+            names = [f"v{k}" for k in range(len(self._results))]
+        names = names[:len(self._results)]
+        delta = self._delta if changes and self._delta is not None else ()
+        record = {
+            "elapsed": self.elapsed,
+            "progress": self.progress,
+            "done": self.done,
+            "eta": self.eta,
+            "jitter": self.jitter,
+            "keyframe": self.keyframe,
+            "values": {name: _plain(self._results[k] if k in delta else self._value_at(k))
+                       for k, name in enumerate(names)},
+        }
+        if self._intervals is not None and any(i is not None for i in self._intervals):
+            record["intervals"] = {
+                name: {str(key): list(bounds) for key, bounds in intervals.items()}
+                for name, intervals in zip(names, self._intervals) if intervals is not None
+            }
+        return record
+
+    def frozen(self, var):
+        """Return the keys of GroupBy *var* frozen by ``freeze=...``."""
+        idx = self._index(var)
+        if self._frozen is None or self._frozen[idx] is None:
+            return set()
+        return self._frozen[idx]
 
 
 # ---------------------------------------------------------------------------
@@ -64,10 +190,32 @@ def _live_flush_if_active(t, done, progress):
         vis._live_flush(t, done, progress)
 
 
+def _same(old, new):
+    """``old == new``, with NaN equal to NaN (an undefined group value
+    that stays undefined is not a change)."""
+    return old == new or (old != old and new != new)
+
+
+def _emit(sinks, state, profiler):
+    """Hand *state* to every sink, timed as the "sink" phase."""
+    if not sinks:
+        return
+    t0 = time.perf_counter()
+    for sink in sinks:
+        sink.emit(state)
+    if profiler is not None:
+        profiler.add("sink", time.perf_counter() - t0)
+
+
 # ---------------------------------------------------------------------------
 # Helper utilities
 # ---------------------------------------------------------------------------
 
+def _live_thin_if_active():
+    vis = sys.modules.get('pyprogressive.vis')
+    return vis is not None and hasattr(vis, '_live_thin') and vis._live_thin()
+
+
 def find_array_id_in_expr(node):
 
     if node is None:
@@ -114,6 +262,37 @@ def find_array_id_in_expr(node):
     return None
 
 
+def _array_of(spec):
+    """Array behind the array part of a symbol name (``3`` or ``3c1``)."""
+    arrid = int(str(spec).partition("c")[0])
+    for arr in current_context().arrays:
+        if arr.id == arrid:
+            return arr
+    raise ValueError("Array not found")
+
+
+def _bq_values(spec):
+    """Column read by a BQ over *spec*: ``3c1`` is column 1 of array 3."""
+    arr = _array_of(spec)
+    col = str(spec).partition("c")[2]
+    if col:
+        return arr.column(int(col))
+    # legacy: a tuple array accumulated without a column reads column 1
+    return arr.column(1 if arr.schema.arity is not None else -1)
+
+
+def _bq_update_spec(key):
+    """Parse a BQ name once into (key, operator, values1, pow1, values2, pow2)."""
+    parts = key.split("_")
+    if parts[1] == "special":
+        operator = parts[5]
+        if operator not in ("mul", "div"):
+            raise ValueError("Operator not found")
+        return (key, operator, _bq_values(parts[2]), int(parts[4]),
+                _bq_values(parts[6]), int(parts[8]))
+    return (key, None, _bq_values(parts[3]), int(parts[1]), None, None)
+
+
 def accum(expr):
 
     bq_expr, _ = convert_with_bq(expr, {})
@@ -125,14 +304,14 @@ def accum(expr):
                               Variable(None, bq_expr))
 
     if related_array_id is None:
-        if not global_arraylist:
+        if not current_context().arrays:
             raise ValueError("global_arraylist is empty")
         related_array_id = "constant"
         return Multiplication(DataLengthToken(arrayid="constant"),
                               Variable(None, bq_expr))
 
-    length_val = len(global_arraylist[int(related_array_id)].data)
-    found_array = global_arraylist[int(related_array_id)]
+    found_array = _array_of(related_array_id)
+    length_val = len(found_array)
 
     return Multiplication(
         DataLengthToken(value=length_val, arrayid=related_array_id, array=found_array),
@@ -151,176 +330,752 @@ def each(*args):
     elif len(args) == 2:
         d, index = args
         if isinstance(d, array):
-            types_in_list = set(type(x) for x in d.data)
-            if len(types_in_list) != 1:
+            # the schema is inferred once by pp.array, so this is O(1)
+            schema = d.schema
+            if not schema.homogeneous:
                 raise ValueError("Array must be homogeneous")
-            if types_in_list == {tuple}:
-                return DataItemToken(d, d.id, index)
-            else:
+            if schema.arity is None:
                 raise ValueError("Array must consist of tuples if there is an index")
+            if not 0 <= index < schema.arity:
+                raise ValueError(f"Index {index} out of range for {schema.arity} columns")
+            return DataItemToken(d, d.id, index)
         elif isinstance(d, GToken):
-            if isinstance(index, int):
+            if isinstance(index, (int, array)):
+                # an int selects a column of the grouped array; an array
+                # supplies the per-group values from a separate aligned array
                 return DataItemToken(d, "GToken", index)
             else:
-                raise ValueError("Index must be int")
+                raise ValueError("Index must be int or array")
         else:
             raise ValueError("Only array is supported.")
     else:
         raise TypeError("Invalid number of arguments to 'each'")
 
 
+def _group_key(item):
+    if not isinstance(item, DataItemToken) or item.id == "GToken":
+        raise ValueError("group_index must be DataItemToken")
+    if item.index == -1:  # counting case
+        using_arr = item.array
+        if using_arr.schema.arity is not None:
+            raise ValueError("Index is not specified")
+    return (item.id, item.index)
+
+
 def group(group_index_item, expr):
-    if isinstance(group_index_item, DataItemToken):
-        if group_index_item.index == -1:  # counting case
-            using_arr = group_index_item.array
-            if type(using_arr.data[0]) is tuple:
-                raise ValueError("Index is not specified")
-
-        group_index = group_index_item.index
-        group_arrayid = group_index_item.id
-        return GroupBy(group_index, group_arrayid, expr)
+    """Group *expr* by one key column or by a composite key.
+
+    *group_index_item* is ``each(arr, k)``, or a tuple of such tokens to
+    group by several columns at once, e.g. ``(each(a, 0), each(a, 2))`` or
+    ``(each(region), each(product))`` over separate key arrays.  Composite
+    keys are reported as tuples.  ``each(G, k)`` reads column *k* of the
+    first key's array; ``each(G, arr)`` reads a separate aligned array.
+
+    Results are keyed by the key values themselves, not by their
+    ``str()``: an int key column gives ``{1: ...}``, not ``{'1': ...}``.
+    Only :meth:`IterState.to_dict` turns keys into strings, for JSON.
+    """
+    if isinstance(group_index_item, (tuple, list)):
+        if not group_index_item:
+            raise ValueError("group_index must not be empty")
+        keys = [_group_key(item) for item in group_index_item]
     else:
-        raise ValueError("group_index must be DataItemToken")
+        keys = [_group_key(group_index_item)]
+
+    group_arrayid, group_index = keys[0]
+    if len(keys) > 1:
+        group_index = tuple(col for _, col in keys)
+    return GroupBy(group_index, group_arrayid, expr, keys=keys)
 
 
 # ---------------------------------------------------------------------------
 # Program
 # ---------------------------------------------------------------------------
 
-class Program:
-    def __init__(self, *args):
-        self.args = args
+# Initial rows per chunk of a preemptible batch; adapted to the chunk time.
+_PREEMPT_CHUNK = 1024
 
-    def run(self, interval=1, tau=0.99):
-        """Progressive generator.  Yields an IterState on each interval tick.
+# Ticks between full copies of the group results in delta-encoded runs.
+_DELTA_KEYFRAME_EVERY = 32
 
-        Usage::
+# Weight of the newest throughput sample in the smoothed rows/sec of the ETA.
+_ETA_SMOOTHING = 0.3
 
-            for state in program.run(interval=0.5):
-                print(state.progress, state.value(my_var))
-                # or: fig, ax = pp.vis.subplots(); ax.line(state.value(my_var))
-        """
-        for arr in global_arraylist:
-            if len(arr) != len(global_arraylist[0]):
+
+class _Scan:
+    """Accumulator state of one progressive run over the data.
+
+    Compiles the program's variables into BQ update specs and group plans,
+    then folds rows in batches (:meth:`step`).  Results are evaluated only
+    when a snapshot is taken (:meth:`snapshot`), not per row.
+    """
+
+    def __init__(self, variables, scan="sequential", seed=None,
+                 confidence=None, freeze=None, profiler=None, context=None,
+                 delta=None):
+        # compile against the arrays of the program's context
+        self.context = context if context is not None else current_context()
+        with self.context:
+            self._compile(variables, scan, seed, confidence, freeze, profiler)
+        # delta-encoded states: a full copy of the group results every
+        # *delta* ticks, only the changed entries in between
+        self.delta = delta
+        self._since_key = None      # ticks since the last keyframe
+        self._last_state = None
+        self._group_values = {id(var): {} for var in self.groups}   # live results
+        self._group_seen = {id(var): {} for var in self.groups}     # code -> rows evaluated at
+        self._group_local = {}
+
+    def _compile(self, variables, scan, seed, confidence, freeze, profiler):
+        arrays = self.context.arrays
+        if not arrays:
+            raise ValueError("global_arraylist is empty")
+        for arr in arrays:
+            if len(arr) != len(arrays[0]):
                 raise ValueError("Array's lengths must be same")
+        total_len = len(arrays[0])
+        if total_len == 0:
+            raise ValueError("Arrays are empty")
+        if freeze is not None and confidence is None:
+            confidence = 0.95
 
-        variables = self.args
+        self.variables = variables
         for var in variables:
-            if isinstance(var, GroupBy):
-                var = flatten_with_sympy(var)
-            else:
+            if not isinstance(var, GroupBy):
                 var.expr = flatten_with_sympy(var)
 
         BQ_dict = {}
-        BQ_group_dict = {}
+        BQ_group_dicts = {}
+        plans = {}   # id(GroupBy) -> its GroupPlan for this scan
 
         # compile: convert to BQ
         for var in variables:
             if isinstance(var, GroupBy):
-                var.expr, BQ_group_dict = group_convert_with_bq(var.expr, BQ_group_dict)
+                plan, names = compile_group(var)
+                plans[id(var)] = plan
+                # normal BQs used inside a group expression are accumulated globally
+                for name in names:
+                    BQ_dict.setdefault(name, 0)
+                BQ_group_dicts[id(var)] = new_group_dict(plan, moments=confidence is not None,
+                                                         freeze=freeze is not None)
             else:
                 var, BQ_dict = convert_with_bq(var, BQ_dict)
 
-        # evaluate
-        elapsed.start()
-        total_len = len(global_arraylist[0])
-        elapsed.total = total_len
-        iter_accum_duration = 0
-        support_normal_BQ_dict = {}
-        var_index = {id(v): i for i, v in enumerate(self.args)}
+        # resolve every BQ to the columns it reads once, not per row
+        self.bq_specs = [_bq_update_spec(key) for key in BQ_dict]
+        self.groups = [var for var in variables if isinstance(var, GroupBy)]
+
+        order = range(total_len)
+        self.stratified = None
+        if scan == "stratified":
+            groups = self.groups
+            if not groups:
+                raise ValueError("Stratified scan needs a GroupBy variable")
+            if any(var.keys != groups[0].keys for var in groups):
+                raise ValueError("Stratified scan needs all GroupBy variables to share one key")
+            encoder = plans[id(groups[0])].encoder
+            self.row_codes, strata = stratify(encoder, total_len)
+            order = interleave(strata, seed)
+            # global BQs are weighted by stratum size; group sizes are exact
+            self.stratified = StratifiedMeans(BQ_dict.keys(), strata)
+            for var in groups:
+                plans[id(var)].encoder = encoder
+                BQ_group_dicts[id(var)]["size"] = self.stratified.weights
+            if freeze is not None:
+                order = _defer_frozen(order, self.row_codes,
+                                      BQ_group_dicts[id(groups[0])]["frozen"])
+        elif scan != "sequential":
+            raise ValueError(f"Unknown scan mode: {scan}")
+
+        self.BQ_dict = BQ_dict
+        self.BQ_group_dicts = BQ_group_dicts
+        self.plans = plans
+        # a plain range is read in contiguous column slices
+        self.order = order if isinstance(order, range) else iter(order)
+        self.total_len = total_len
+        self.pos = 0
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2) if confidence is not None else None
+        self.freeze = freeze
+        self.var_index = {id(v): i for i, v in enumerate(variables)}
+        self.profiler = profiler
+        self.elapsed = Elapsed()   # per run, so concurrent runs keep their own clock
+        self.elapsed.total = total_len
+        self.chunk = _PREEMPT_CHUNK   # rows per chunk of a preemptible batch
+        self.rate = None      # smoothed rows/sec, for the ETA
+        self._mark = None     # (time, rows) at the previous snapshot
+
+    @property
+    def finished(self):
+        return self.pos >= self.total_len
+
+    def step(self, n, until=None, chunk_time=None):
+        """Fold the next *n* rows (fewer at the end); returns rows folded.
+
+        With *until* (a ``time.perf_counter()`` value) the batch is
+        preemptible: rows are folded in chunks sized to take about
+        *chunk_time* seconds, and the batch stops at the first chunk
+        boundary past *until*.
+        """
+        n = min(n, self.total_len - self.pos)
+        if n <= 0:
+            return 0
+        if until is None:
+            self._fold(n)
+            return n
+
+        done = 0
+        while done < n:
+            m = min(self.chunk, n - done)
+            t0 = time.perf_counter()
+            self._fold(m)
+            done += m
+            t1 = time.perf_counter()
+            if t1 >= until:
+                break
+            if chunk_time is not None:
+                if t1 - t0 > chunk_time:
+                    self.chunk = max(1, self.chunk // 2)
+                elif 4 * (t1 - t0) < chunk_time:
+                    self.chunk *= 2
+        return done
+
+    def _fold(self, n):
+        """Fold the next *n* rows, which must exist."""
+        if isinstance(self.order, range):
+            rows = self.order[self.pos:self.pos + n]
+        else:
+            rows = list(islice(self.order, n))
 
-        for idx in range(total_len):
-            iter_start = time.perf_counter()
+        profiler = self.profiler
+        if profiler is not None:
+            t0 = time.perf_counter()
 
-            for var in self.args:
-                if isinstance(var, GroupBy):
-                    BQ_group_dict = detect_group_bq(var, BQ_group_dict, idx)
+        if self.stratified is not None:
+            self._stratified_update(rows)
+        else:
+            _bq_batch_update(self.bq_specs, self.BQ_dict, rows, self.pos)
+
+        if profiler is not None:
+            t1 = time.perf_counter()
+            profiler.add("bq_update", t1 - t0)
+
+        for var in self.groups:
+            BQ_group_dict = self.BQ_group_dicts[id(var)]
+            plan = self.plans[id(var)]
+            for idx in rows:
+                group_by_bq_update(plan, BQ_group_dict, idx)
+
+        if profiler is not None:
+            profiler.add("group_update", time.perf_counter() - t1)
+            profiler.rows += n
+
+        self.pos += n
+
+    def _stratified_update(self, rows):
+        stratified = self.stratified
+        BQ_dict = self.BQ_dict
+        for idx in rows:
+            code = self.row_codes[idx]
+            n = stratified.observe(code)
+            for key, operator, values1, pow1, values2, pow2 in self.bq_specs:
+                if operator is None:
+                    val = values1[idx] ** pow1
+                elif operator == "mul":
+                    val = (values1[idx] ** pow1) * (values2[idx] ** pow2)
+                else:
+                    val = (values1[idx] ** pow1) / (values2[idx] ** pow2)
+                BQ_dict[key] = stratified.update(key, code, n, val)
 
-            for keys in BQ_group_dict.keys():
-                if keys.split("_")[0] == "BQ" and keys.split("_")[2] == "of":
-                    support_normal_BQ_dict[keys] = 0
+    def evaluate(self):
+        """Evaluate every variable from the current BQs; returns the results list."""
+        results = []
+        for var in self.variables:
+            if isinstance(var, GroupBy):
+                var.val = group_evaluator(self.plans[id(var)], self.BQ_group_dicts[id(var)],
+                                          index=self.pos - 1,
+                                         gindex=var.array_index,
+                                         normal_BQ_dict=self.BQ_dict)
+                results.append(var.val)
+            else:
+                try:
+                    result = evaluate(var, self.BQ_dict, length=self.total_len)
+                except Exception:
+                    result = float('nan')
+                var.val = result
+                results.append(result)
+        return results
+
+    def evaluate_delta(self):
+        """Like :meth:`evaluate`, but GroupBy entries are ``{key: value}`` of
+        the groups whose value changed since the previous call.
+
+        Groups whose value only depends on their own rows are re-evaluated
+        only if rows were folded into them; the others are re-evaluated
+        and compared.  ``var.val`` gets a copy of the full results.
+        """
+        results = []
+        for var in self.variables:
+            if not isinstance(var, GroupBy):
+                try:
+                    result = evaluate(var, self.BQ_dict, length=self.total_len)
+                except Exception:
+                    result = float('nan')
+                var.val = result
+                results.append(result)
+                continue
+            plan = self.plans[id(var)]
+            BQ_group_dict = self.BQ_group_dicts[id(var)]
+            local = self._group_local.get(id(var))
+            if local is None:
+                local = self._group_local[id(var)] = group_is_local(plan, BQ_group_dict)
+            lengths = BQ_group_dict["length"]
+            seen = self._group_seen[id(var)]
+            values = self._group_values[id(var)]
+            changed = {}
+            for code, n in lengths.items():
+                if local and seen.get(code) == n:
+                    continue
+                seen[code] = n
+                key = plan.encoder.decode(code)
+                value = group_evaluator(plan.expr, BQ_group_dict, category=code,
+                                        index=self.pos - 1, gindex=plan.array_index,
+                                        normal_BQ_dict=self.BQ_dict)
+                if key not in values or not _same(values[key], value):
+                    values[key] = changed[key] = value
+            # a snapshot: the scan keeps updating its own dict in place
+            var.val = dict(values)
+            results.append(changed)
+        return results
+
+    def _delta_results(self):
+        """Results and IterState delta arguments of a delta-encoded snapshot."""
+        changes = self.evaluate_delta()
+        keyframe = self._since_key is None or self._since_key + 1 >= self.delta
+        self._since_key = 0 if keyframe else self._since_key + 1
+        if keyframe:
+            results = [var.val if isinstance(var, GroupBy) else value
+                       for var, value in zip(self.variables, changes)]
+            return results, None, None
+        delta_idx = {k for k, var in enumerate(self.variables) if isinstance(var, GroupBy)}
+        return changes, delta_idx, self._last_state
+
+    def eta(self):
+        """Seconds left at the smoothed rows/sec, measured between snapshots."""
+        now = time.perf_counter()
+        then, pos = self._mark if self._mark is not None else (self.elapsed.start_time, 0)
+        if now > then and self.pos > pos:
+            rate = (self.pos - pos) / (now - then)
+            self.rate = rate if self.rate is None else self.rate + _ETA_SMOOTHING * (rate - self.rate)
+        self._mark = (now, self.pos)
+        if self.finished:
+            return 0.0
+        if not self.rate:
+            return None
+        return (self.total_len - self.pos) / self.rate
+
+    def _stop_clock(self):
+        self.elapsed.stop()
+        self.elapsed.current = self.pos
+        self.elapsed.done = self.finished
+
+    def snapshot(self, jitter=None):
+        """Evaluate the variables and wrap them in an IterState."""
+        profiler = self.profiler
+        if profiler is None and self.delta is None:
+            results = self.evaluate()
+            intervals, frozen = self._group_intervals()
+            self._stop_clock()
+            return IterState(results, self.elapsed, self.var_index, intervals, frozen,
+                             eta=self.eta(), jitter=jitter)
+
+        t0 = time.perf_counter()
+        if self.delta is None:
+            results, delta_idx, prev = self.evaluate(), None, None
+        else:
+            results, delta_idx, prev = self._delta_results()
+        intervals, frozen = self._group_intervals()
+        t1 = time.perf_counter()
+        if profiler is not None:
+            profiler.add("evaluate", t1 - t0)
+        self._stop_clock()
+        state = IterState(results, self.elapsed, self.var_index, intervals, frozen,
+                          profile=profiler.snapshot() if profiler is not None else None,
+                          eta=self.eta(), jitter=jitter, prev=prev, delta=delta_idx)
+        if profiler is not None:
+            profiler.add("state", time.perf_counter() - t1)
+        self._last_state = state
+        return state
+
+    def drop_moments(self):
+        """Free the per-group second moments; intervals and freezing stop.
+
+        Returns False if the run was not tracking them.
+        """
+        if self.z is None:
+            return False
+        for var in self.groups:
+            self.BQ_group_dicts[id(var)].pop("M2", None)
+        self.z = None
+        self.freeze = None
+        return True
+
+    def _group_intervals(self):
+        """Per-variable interval dicts and frozen key sets for an IterState."""
+        if self.z is None:
+            return None, None
+        freeze = None if self.finished else self.freeze
+        intervals, frozen = [], []
+        for var in self.variables:
+            if not isinstance(var, GroupBy):
+                intervals.append(None)
+                frozen.append(None)
+                continue
+            plan = self.plans[id(var)]
+            BQ_group_dict = self.BQ_group_dicts[id(var)]
+            widths = group_intervals(plan, BQ_group_dict, self.z, self.pos - 1,
+                                     self.total_len, self.BQ_dict)
+            bounds = {}
+            for code, width in widths.items():
+                key = plan.encoder.decode(code)
+                bounds[key] = (var.val[key] - width, var.val[key] + width)
+            intervals.append(bounds)
+            if freeze is not None:
+                freeze_groups(BQ_group_dict, widths, freeze)
+            codes = BQ_group_dict.get("frozen", ())
+            frozen.append({plan.encoder.decode(code) for code in codes})
+        return intervals, frozen
+
+
+def _bq_batch_update(bq_specs, BQ_dict, rows, done):
+    """Fold *rows* (a range or a list of row indices) into the BQ running
+    means, *done* being the number of rows folded in before."""
+    total = done + len(rows)
+    contiguous = isinstance(rows, range)
+    for key, operator, values1, pow1, values2, pow2 in bq_specs:
+        xs = values1[rows.start:rows.stop] if contiguous else [values1[i] for i in rows]
+        if operator is None:
+            batch = sum(xs) if pow1 == 1 else sum(x ** pow1 for x in xs)
+        else:
+            ys = values2[rows.start:rows.stop] if contiguous else [values2[i] for i in rows]
+            if operator == "mul":
+                batch = sum((x ** pow1) * (y ** pow2) for x, y in zip(xs, ys))
+            else:
+                batch = sum((x ** pow1) / (y ** pow2) for x, y in zip(xs, ys))
+        BQ_dict[key] = (BQ_dict[key] * done + batch) / total
 
-            for keys in support_normal_BQ_dict.keys():
-                if keys not in BQ_dict.keys():
-                    BQ_dict[keys] = support_normal_BQ_dict[keys]
 
-            for keys in BQ_dict.keys():
-                if keys.split("_")[1] == "group":
-                    pass
-                if keys.split("_")[1] == "special":
-                    arr1id, pow1 = keys.split("_")[2], keys.split("_")[4]
-                    arr2id, pow2 = keys.split("_")[6], keys.split("_")[8]
-                    operator  = keys.split("_")[5]
-
-                    arr1 = arr2 = None
-                    for arr in global_arraylist:
-                        if arr.id == int(arr1id):
-                            arr1 = arr
-                        if arr.id == int(arr2id):
-                            arr2 = arr
-                    if arr1 is None or arr2 is None:
-                        raise ValueError("Array not found")
-
-                    if operator == "mul":
-                        BQ_dict[keys] = (BQ_dict[keys] * idx + (arr1.data[idx] ** int(pow1)) * (arr2.data[idx] ** int(pow2))) / (idx + 1)
-                    elif operator == "div":
-                        BQ_dict[keys] = (BQ_dict[keys] * idx + (arr1.data[idx] ** int(pow1)) / (arr2.data[idx] ** int(pow2))) / (idx + 1)
-                    else:
-                        raise ValueError("Operator not found")
+class Program:
+    def __init__(self, *args):
+        self.args = args
+        self.context = current_context()   # the arrays the program reads
+        self.profile = None   # Profiler of the last run(profile=True)
+        self._scan = None     # accumulator state of the current or last run
+
+    def explain(self, sample=1000):
+        """Describe what the program compiles to, without running it.
+
+        Returns a :class:`~pyprogressive.explain.QueryPlan`; ``print()`` it
+        for the lowered BQs, group templates, per-tick expressions, cost
+        estimates and slow paths.  The first *sample* rows are scanned to
+        find variables whose evaluation raises, and the number of groups is
+        estimated from *sample* evenly spaced rows.
+        """
+        return QueryPlan(_Scan(self.args, context=self.context), sample)
+
+    def memory_report(self):
+        """Approximate bytes held by the arrays, the accumulators of the
+        current (or last) run, the symbol table and the live chart history.
+
+        See :func:`pyprogressive.memory.memory_report` for the keys.
+        """
+        return memory_report(self._scan, context=self.context)
+
+    def estimate_runtime(self, interval=1, sample=10000, **options):
+        """Predict how long ``run(interval, **options)`` will take.
+
+        Compiles the program and scans its first *sample* rows to measure
+        the compile time, the scan throughput and the cost of one tick, then
+        extrapolates to the full data.  *options* are the scan options of
+        :meth:`run` (``scan``, ``seed``, ``confidence``, ``freeze``).
+        Returns a dict of seconds: ``compile``, ``scan``, ``tick``,
+        ``total``, plus ``rows_per_sec``, ``rows`` and ``sample_rows``.
+        """
+        t0 = time.perf_counter()
+        scan_state = _Scan(self.args, context=self.context, **options)
+        t1 = time.perf_counter()
+        rows = scan_state.step(min(sample, scan_state.total_len))
+        t2 = time.perf_counter()
+        scan_state.evaluate()
+        scan_state._group_intervals()
+        t3 = time.perf_counter()
+
+        rate = rows / (t2 - t1) if t2 > t1 else float('inf')
+        scan_time = scan_state.total_len / rate
+        ticks = int(scan_time / interval) if interval > 0 else scan_state.total_len
+        tick = t3 - t2
+        return {
+            "compile": t1 - t0,
+            "scan": scan_time,
+            "tick": tick,
+            "total": (t1 - t0) + scan_time + (ticks + 1) * tick,
+            "rows_per_sec": rate,
+            "rows": scan_state.total_len,
+            "sample_rows": rows,
+        }
+
+    def run(self, interval=1, tau=0.99, scan="sequential", seed=None,
+            confidence=None, freeze=None, estimator=None, profile=False,
+            memory_budget=None, on_budget="raise", max_tick_overshoot=None,
+            sinks=None, delta=None):
+        """Progressive generator.  Yields an IterState on each interval tick.
+
+        Rows are folded in batches whose size is chosen by *estimator* (by
+        default a :class:`~pyprogressive.estimator.SimpleLinearEstimator`)
+        so that a batch ends close to the next tick; the clock is only read
+        between batches.  Any object with ``estimate_next(seconds)``
+        (returning the rows of the next batch), ``start()`` and
+        ``end(rows)`` (called with the rows the batch actually folded) can
+        be plugged in.
+
+        *scan* selects the row order: ``"sequential"`` reads rows in array
+        order; ``"stratified"`` indexes the rows of every group up front and
+        interleaves them round-robin (shuffled within each group, *seed*),
+        so rare groups converge as early as large ones.  Stratified scans
+        need every GroupBy variable of the program to share one key.
+
+        *confidence* (e.g. ``0.95``) tracks per-group second moments and
+        reports ``state.interval(group_var)`` on every tick.  *freeze*
+        (a half-width) stops updating groups whose interval is already that
+        tight; a stratified scan also defers their remaining rows to the end
+        of the scan so the other groups get the sampling budget first.
+
+        *profile* (``True`` or a :class:`~pyprogressive.profile.Profiler`)
+        times every phase of the loop; each state then has ``state.profile``
+        and ``program.profile.report()`` summarises the run afterwards.  A
+        Profiler instance is reset when the run starts.
+
+        *memory_budget* (bytes) is checked against :meth:`memory_report` on
+        every tick.  With ``on_budget="raise"`` an overrun raises
+        :class:`~pyprogressive.memory.MemoryBudgetExceeded`; with
+        ``"degrade"`` the run first frees optional state — the per-group
+        second moments (intervals stop), then every other point of the
+        live chart history — and only raises if that is not enough.
+
+        *max_tick_overshoot* (seconds) makes batches preemptible: rows are
+        folded in chunks that each take at most about half of it, and a
+        batch stops at the first chunk boundary once the tick is due, so a
+        misjudged batch or a run of heavy group rows cannot push the tick
+        back by more than that.  ``state.jitter`` reports how late each
+        tick was.
+
+        *sinks* (see :mod:`pyprogressive.sinks`) receive every state
+        before it is yielded — e.g. an NDJSON file, a callback run on its
+        own thread, or a shared-memory ring read by another process — and
+        are flushed when the run ends.
+
+        *delta* (``True`` or a keyframe interval in ticks) delta-encodes
+        GroupBy results: a state stores only the groups whose value
+        changed since the previous state (``state.changes(var)``), with a
+        full copy every *delta* ticks.  ``state.value(var)`` rebuilds the
+        full dict on demand.  With many groups this saves copying and
+        serializing every group on every tick; groups whose value only
+        depends on their own rows are not even re-evaluated unless rows
+        reached them.
 
+        Usage::
+
+            for state in program.run(interval=0.5):
+                print(state.progress, state.value(my_var))
+                # or: fig, ax = pp.vis.subplots(); ax.line(state.value(my_var))
+        """
+        yield from self._drive(interval=interval, tau=tau, scan=scan, seed=seed,
+                               confidence=confidence, freeze=freeze, estimator=estimator,
+                               profile=profile, memory_budget=memory_budget,
+                               on_budget=on_budget, max_tick_overshoot=max_tick_overshoot,
+                               sinks=sinks, delta=delta)
+
+    async def arun(self, interval=1, step_time=0.01, executor=None, **run_options):
+        """Asynchronous :meth:`run`: ``async for state in program.arun(...)``.
+
+        Without an *executor* the rows are folded on the event loop itself,
+        in batches of at most *step_time* seconds with a yield to the loop
+        after each one, so many progressive queries can share one loop and
+        no other task waits longer than *step_time*.  With a
+        :class:`concurrent.futures.Executor` every batch runs in the executor
+        instead.  Compiling always happens in an executor (the loop's
+        default one if *executor* is None).  Takes the other options of
+        :meth:`run`.
+        """
+        loop = asyncio.get_running_loop()
+        steps = self._drive(interval=interval, step_time=step_time, **run_options)
+        pending = None   # batch running in the executor
+
+        async def in_executor():
+            nonlocal pending
+            pending = loop.run_in_executor(executor, next, steps, _END)
+            # shielded: cancelling the consumer must not abandon a running
+            # batch, the generator is closed once the batch has returned
+            item = await asyncio.shield(pending)
+            pending = None
+            return item
+
+        try:
+            # compiling is one long sympy call: keep it off the loop
+            # (in the loop's default executor when none is given)
+            item = await in_executor()
+            while True:
+                if item is _END:
+                    return
+                if item is not None:
+                    yield item
+                await asyncio.sleep(0)
+                if executor is None:
+                    item = next(steps, _END)
                 else:
-                    degree, compute_arr = keys.split("_")[1], keys.split("_")[3]
-                    target_arr = None
-                    for arr in global_arraylist:
-                        if arr.id == int(compute_arr):
-                            target_arr = arr
-                    if target_arr is None:
-                        raise ValueError("Array not found")
-                    if type(target_arr.data[idx]) is tuple:
-                        BQ_dict[keys] = (BQ_dict[keys] * idx + target_arr.data[idx][1] ** int(degree)) / (idx + 1)
-                    else:
-                        BQ_dict[keys] = (BQ_dict[keys] * idx + target_arr.data[idx] ** int(degree)) / (idx + 1)
-
-            results = []
-
-            BQ_group_dict = group_by_bq_update(BQ_group_dict, idx)
-
-            for var in self.args:
-                if isinstance(var, GroupBy):
-                    group_index = var.group_index
-                    array_index = var.array_index
-                    global_G_arridx = array_index
-
-                    var.val = group_evaluator(var, BQ_group_dict, index=idx,
-                                             gindex=array_index,
-                                             normal_BQ_dict=BQ_dict)
-                    results.append(var.val)
+                    item = await in_executor()
+        finally:
+            if pending is not None:
+                try:
+                    await pending
+                except BaseException:
+                    pass
+            steps.close()
+
+    def _drive(self, interval=1, tau=0.99, scan="sequential", seed=None,
+               confidence=None, freeze=None, estimator=None, profile=False,
+               memory_budget=None, on_budget="raise", max_tick_overshoot=None,
+               sinks=None, delta=None, step_time=None):
+        """The loop behind run() and arun(): yields an IterState at every
+        tick and, when batches are capped at *step_time* seconds, None after
+        every batch that did not end in a tick."""
+        if on_budget not in ("raise", "degrade"):
+            raise ValueError(f"Unknown on_budget: {on_budget}")
+        sinks = list(sinks) if sinks is not None else []
+        profiler = profile if isinstance(profile, Profiler) else (Profiler() if profile else None)
+        self.profile = profiler
+        if profiler is not None:
+            profiler.reset()
+            t0 = time.perf_counter()
+        if delta is True:
+            delta = _DELTA_KEYFRAME_EVERY
+        scan_state = _Scan(self.args, scan=scan, seed=seed, confidence=confidence,
+                           freeze=freeze, profiler=profiler, context=self.context,
+                           delta=delta or None)
+        if profiler is not None:
+            profiler.add("compile", time.perf_counter() - t0)
+        self._scan = scan_state
+        if memory_budget is not None:
+            # the data does not change during the run: measure it once
+            array_sizes = {arr.id: sizeof_array(arr) for arr in self.context.arrays}
+        if estimator is None:
+            estimator = SimpleLinearEstimator()
+
+        # batches are preempted at the tick (or after *step_time*) in
+        # chunks short enough to keep the overshoot bounded
+        preempt = max_tick_overshoot if max_tick_overshoot is not None else step_time
+        chunk_time = preempt / 2 if preempt is not None else None
+
+        try:
+            # evaluate
+            scan_state.elapsed.start()
+            deadline = scan_state.elapsed.start_time + interval
+
+            while not scan_state.finished:
+                now = time.perf_counter()
+                tick_at = deadline - (1 - tau) * interval
+                budget = max(deadline - now, 0.0)
+                if step_time is not None:
+                    budget = min(budget, step_time)
+                n = estimator.estimate_next(budget)
+                estimator.start()
+                if preempt is None:
+                    rows = scan_state.step(n)
                 else:
-                    try:
-                        result = evaluate(var, BQ_dict, length=len(global_arraylist[0]))
-                    except Exception:
-                        result = float('nan')
-                    var.val = result
-                    results.append(result)
-
-            iter_accum_duration += time.perf_counter() - iter_start
-
-            if iter_accum_duration > interval * tau:
-                elapsed.stop()
-                elapsed.current = idx + 1
-                elapsed.done = False
-                pct = (idx + 1) / total_len
-                cb_start = time.perf_counter()
-                yield IterState(results, elapsed, var_index)
-                _live_flush_if_active(elapsed.elapsed(), False, pct)
-                iter_accum_duration -= interval
-                iter_accum_duration += time.perf_counter() - cb_start
-
-        elapsed.stop()
-        elapsed.current = total_len
-        elapsed.done = True
-        yield IterState(results, elapsed, var_index)
-        _live_flush_if_active(elapsed.elapsed(), True, 1.0)
+                    until = tick_at if step_time is None else min(tick_at, now + step_time)
+                    rows = scan_state.step(n, until, chunk_time)
+                estimator.end(rows)
+
+                now = time.perf_counter()
+                if scan_state.finished:
+                    break
+                # tick once at least tau of the interval has passed
+                if now >= tick_at:
+                    if profiler is not None:
+                        profiler.tick(now - deadline)
+                    if memory_budget is not None:
+                        _enforce_budget(scan_state, memory_budget, on_budget, array_sizes)
+                    state = scan_state.snapshot(jitter=now - deadline)
+                    _emit(sinks, state, profiler)
+                    yield state
+                    self._flush_vis(state, profiler)
+                    deadline += interval
+                    now = time.perf_counter()
+                    if deadline < now:
+                        # the consumer overran the interval: restart the cadence
+                        deadline = now + interval
+                elif step_time is not None:
+                    yield None
+
+            if memory_budget is not None:
+                _enforce_budget(scan_state, memory_budget, on_budget, array_sizes)
+            state = scan_state.snapshot()
+            _emit(sinks, state, profiler)
+            yield state
+            self._flush_vis(state, profiler)
+        finally:
+            for sink in sinks:
+                sink.flush()
+
+    def start(self, **run_options):
+        """Run the program on a worker thread; returns a
+        :class:`~pyprogressive.background.ProgressiveRun`.
+
+        Takes the options of :meth:`run`.  The scan runs at full speed
+        while the handle keeps only the latest IterState, so a slow
+        consumer never throttles it; the handle can pause, resume and
+        cancel the run.
+        """
+        return ProgressiveRun(self, **run_options)
+
+    @staticmethod
+    def _flush_vis(state, profiler):
+        if profiler is None:
+            _live_flush_if_active(state.elapsed, state.done, state.progress)
+            return
+        t0 = time.perf_counter()
+        _live_flush_if_active(state.elapsed, state.done, state.progress)
+        profiler.add("vis_flush", time.perf_counter() - t0)
+
+
+def _enforce_budget(scan_state, budget, on_budget, array_sizes):
+    """Raise (or first degrade, see Program.run) if the run is over *budget* bytes."""
+    report = memory_report(scan_state, array_sizes)
+    if report["total"] <= budget:
+        return
+    if on_budget == "degrade":
+        if scan_state.drop_moments():
+            warnings.warn("memory budget exceeded: dropped per-group intervals",
+                          ResourceWarning, stacklevel=3)
+            report = memory_report(scan_state, array_sizes)
+        while report["total"] > budget and _live_thin_if_active():
+            warnings.warn("memory budget exceeded: thinned the live chart history",
+                          ResourceWarning, stacklevel=3)
+            report = memory_report(scan_state, array_sizes)
+        if report["total"] <= budget:
+            return
+    raise MemoryBudgetExceeded(
+        f"run needs about {report['total']} bytes, over the budget of {budget}", report)
+
+
+def _defer_frozen(order, row_codes, frozen):
+    """Scan *order*, pushing rows of groups frozen meanwhile to the end."""
+    deferred = []
+    for idx in order:
+        if row_codes[idx] in frozen:
+            deferred.append(idx)
+        else:
+            yield idx
+    yield from deferred
 
 
 def compile(*args):
@@ -0,0 +1,101 @@
+import time
+
+
+class Profiler:
+    """Per-phase timings of a progressive run.
+
+    Pass ``profile=True`` (or a Profiler instance) to ``Program.run()``.
+    Every phase of the run loop adds its duration here; each IterState
+    then carries a ``profile`` snapshot and ``program.profile`` keeps the
+    profiler for the summary report once the run is over.
+
+    Phases
+    ------
+    compile      : lowering the variables to BQs before the scan
+    bq_update    : folding rows into the global BQ running means
+    group_update : folding rows into the per-group accumulators
+    evaluate     : evaluating the variables (and group intervals) at a tick
+    state        : building the IterState
+    vis_flush    : rendering the live chart after a tick
+    sink         : handing states to the run's sinks
+
+    Hooks registered with :meth:`add_hook` are called as
+    ``hook(phase, seconds)`` whenever a phase is recorded.
+
+    A run resets the profiler when it starts, so a Profiler created ahead
+    of time, or passed to several runs, reports the latest run; its hooks
+    are kept.
+    """
+
+    PHASES = ("compile", "bq_update", "group_update", "evaluate", "state", "vis_flush", "sink")
+
+    def __init__(self):
+        self._hooks = []
+        self.reset()
+
+    def reset(self):
+        """Zero the counters and restart the wall clock."""
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.rows = 0
+        self.ticks = 0
+        self.jitter = []        # seconds each tick came after its deadline
+        self.start_time = time.perf_counter()
+
+    def add_hook(self, hook):
+        """Call ``hook(phase, seconds)`` for every recorded phase."""
+        self._hooks.append(hook)
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+        for hook in self._hooks:
+            hook(phase, seconds)
+
+    def tick(self, jitter):
+        self.ticks += 1
+        self.jitter.append(jitter)
+
+    def rows_per_sec(self):
+        scan_time = self.phases["bq_update"] + self.phases["group_update"]
+        return self.rows / scan_time if scan_time > 0 else 0.0
+
+    def snapshot(self):
+        """Plain-dict view of the counters so far (stored on each IterState)."""
+        return {
+            "phases": dict(self.phases),
+            "rows": self.rows,
+            "rows_per_sec": self.rows_per_sec(),
+            "ticks": self.ticks,
+            "jitter": self.jitter[-1] if self.jitter else 0.0,
+            "wall": time.perf_counter() - self.start_time,
+        }
+
+    def summary(self):
+        """Run-level totals, including tick jitter statistics."""
+        summary = self.snapshot()
+        del summary["jitter"]
+        jitter = sorted(self.jitter)
+        if jitter:
+            summary["jitter_mean"] = sum(jitter) / len(jitter)
+            summary["jitter_p95"] = jitter[min(len(jitter) - 1, int(0.95 * len(jitter)))]
+            summary["jitter_max"] = jitter[-1]
+        return summary
+
+    def report(self):
+        """Human-readable summary table."""
+        summary = self.summary()
+        wall = summary["wall"]
+        lines = [f"{'phase':<14}{'seconds':>10}{'share':>8}"]
+        for phase, seconds in summary["phases"].items():
+            share = seconds / wall if wall > 0 else 0.0
+            lines.append(f"{phase:<14}{seconds:>10.4f}{share:>8.1%}")
+        lines.append(f"rows {summary['rows']} in {wall:.3f}s "
+                     f"({summary['rows_per_sec']:,.0f} rows/s while scanning), "
+                     f"{summary['ticks']} ticks")
+        if "jitter_mean" in summary:
+            lines.append(f"tick jitter: mean {summary['jitter_mean'] * 1000:.2f}ms, "
+                         f"p95 {summary['jitter_p95'] * 1000:.2f}ms, "
+                         f"max {summary['jitter_max'] * 1000:.2f}ms")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.report()
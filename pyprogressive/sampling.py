@@ -0,0 +1,72 @@
+import random
+
+
+def stratify(encoder, total_len):
+    """Index every row by its group code: returns (row codes, {code: rows})."""
+    codes = [encoder.encode(idx) for idx in range(total_len)]
+    strata = {}
+    for idx, code in enumerate(codes):
+        rows = strata.get(code)
+        if rows is None:
+            rows = strata[code] = []
+        rows.append(idx)
+    return codes, strata
+
+
+def interleave(strata, seed=None):
+    """Scan order that visits the strata round-robin.
+
+    Rows are shuffled within each stratum, then one row is taken from every
+    stratum that still has rows left, so every group gets the same number
+    of samples until it runs out and small groups converge as early as the
+    large ones.
+    """
+    rng = random.Random(seed)
+    queues = []
+    for rows in strata.values():
+        rows = list(rows)
+        rng.shuffle(rows)
+        queues.append(rows)
+
+    order = []
+    depth = 0
+    while queues:
+        order.extend(rows[depth] for rows in queues)
+        depth += 1
+        queues = [rows for rows in queues if len(rows) > depth]
+    return order
+
+
+class StratifiedMeans:
+    """Population means estimated from a stratified (non-uniform) scan.
+
+    A plain running mean over an interleaved scan over-weights small
+    strata.  Each stratum keeps its own running mean instead, and the
+    estimate is their average weighted by stratum size, restricted to the
+    strata seen so far.  Updates are O(1): the weighted sum is adjusted in
+    place whenever one stratum mean moves.
+    """
+
+    def __init__(self, keys, strata):
+        self.weights = {code: len(rows) for code, rows in strata.items()}
+        self.counts = {}                       # code -> rows seen
+        self.means = {key: {} for key in keys}  # key -> {code: mean}
+        self.weighted = dict.fromkeys(keys, 0.0)
+        self.seen_weight = 0
+
+    def observe(self, code):
+        """Count one more row of stratum *code*; returns its row count."""
+        n = self.counts.get(code, 0) + 1
+        self.counts[code] = n
+        if n == 1:
+            self.seen_weight += self.weights[code]
+        return n
+
+    def update(self, key, code, n, val):
+        """Fold *val* into the mean of *key* for stratum *code* (n-th row)."""
+        means = self.means[key]
+        mean = means.get(code, 0)
+        new = mean + (val - mean) / n
+        means[code] = new
+        self.weighted[key] += self.weights[code] * (new - mean)
+        return self.weighted[key] / self.seen_weight
@@ -0,0 +1,121 @@
+import time
+
+_END = object()
+
+
+class Task:
+    """Handle of one program run added to a :class:`Scheduler`."""
+
+    def __init__(self, program, steps, weight, priority, vtime):
+        self.program = program
+        self.steps = steps
+        self.weight = weight
+        self.priority = priority
+        self.share = weight * 2 ** priority
+        self.vtime = vtime        # scan time used / share
+        self.scan = None          # the run's _Scan, once compiled
+        self.cpu = 0.0
+        self.rows = 0
+        self.ticks = 0
+        self.done = False
+        self.added = time.perf_counter()
+        self.first_state = None   # seconds from add() to the first state
+
+
+class Scheduler:
+    """Runs many programs cooperatively on one thread.
+
+    Every program is driven in batches of at most *step_time* seconds.  The
+    next batch goes to the program that has used the least scan time
+    relative to its share, ``weight * 2 ** priority``, so CPU time is
+    shared in proportion to the shares: each priority level doubles a
+    program's share, and no program starves however high the priority of
+    the others.  A program added later starts level with the others
+    instead of owing them their past time, so a short interactive query
+    gets its first estimate after a few slices even while large scans are
+    running::
+
+        scheduler = pp.Scheduler()
+        scheduler.add(big_scan, interval=5)
+        quick = scheduler.add(quick_query, interval=0.2, priority=1)
+        for task, state in scheduler.run():
+            if task is quick:
+                ...
+
+    Programs can be added or removed while ``run()`` is being iterated.
+    ``add()`` returns the task handle that identifies the run in
+    ``remove()`` and ``stats()`` (the same program may be added twice);
+    its ``program`` attribute is the program.
+    """
+
+    def __init__(self, step_time=0.01):
+        self.step_time = step_time
+        self._tasks = []      # still running
+        self._all = []        # every task added, for stats()
+
+    def add(self, program, weight=1, priority=0, interval=1, **run_options):
+        """Schedule ``program.run(interval, **run_options)``; returns its :class:`Task`."""
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        vtime = min((task.vtime for task in self._tasks), default=0.0)
+        steps = program._drive(interval=interval, step_time=self.step_time,
+                               **run_options)
+        task = Task(program, steps, weight, priority, vtime)
+        self._tasks.append(task)
+        self._all.append(task)
+        return task
+
+    def remove(self, task):
+        """Stop and drop *task* (or every task of a program)."""
+        for t in list(self._all):
+            if t is task or t.program is task:
+                t.steps.close()
+                if t in self._tasks:
+                    self._tasks.remove(t)
+                self._all.remove(t)
+
+    def _pick(self):
+        # ties (e.g. just added) go to the higher priority
+        return min(self._tasks, key=lambda task: (task.vtime, -task.priority))
+
+    def run(self):
+        """Yield ``(task, IterState)`` from every program until all are done."""
+        while self._tasks:
+            task = self._pick()
+            t0 = time.perf_counter()
+            item = next(task.steps, _END)
+            t1 = time.perf_counter()
+            task.cpu += t1 - t0
+            task.vtime += (t1 - t0) / task.share
+            if task.scan is None:
+                # compiled by the first step; batches never interleave
+                task.scan = task.program._scan
+            if task.scan is not None:
+                task.rows = task.scan.pos
+            if item is _END:
+                task.done = True
+                self._tasks.remove(task)
+                continue
+            if item is not None:
+                task.ticks += 1
+                if task.first_state is None:
+                    task.first_state = t1 - task.added
+                yield task, item
+
+    def stats(self):
+        """{task: dict} with rows, cpu seconds, rows_per_sec (over the
+        task's own slices), ticks, first_state latency and done, for
+        every task added (and not removed)."""
+        stats = {}
+        for task in self._all:
+            stats[task] = {
+                "rows": task.rows,
+                "cpu": task.cpu,
+                "rows_per_sec": task.rows / task.cpu if task.cpu > 0 else 0.0,
+                "ticks": task.ticks,
+                "first_state": task.first_state,
+                "done": task.done,
+                "weight": task.weight,
+                "priority": task.priority,
+            }
+        return stats
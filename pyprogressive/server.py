@@ -0,0 +1,243 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from .sinks import Sink
+
+
+def _diff_values(prev, values):
+    """``{name: value}`` entries of *values* that differ from *prev*; dicts
+    (group results, intervals) are diffed per key."""
+    out = {}
+    for name, value in values.items():
+        old = prev.get(name)
+        if isinstance(value, dict) and isinstance(old, dict):
+            changed = {key: v for key, v in value.items() if old.get(key) != v}
+            if changed:
+                out[name] = changed
+        elif old != value:
+            out[name] = value
+    return out
+
+
+def _diff(prev, record):
+    """The part of *record* that differs from *prev* (both full ``to_dict``
+    records).
+
+    Tick fields are always included; ``values`` and ``intervals`` only
+    with the variables, and for groups only the keys, that changed.
+    """
+    delta = {key: value for key, value in record.items()
+             if key not in ("values", "intervals")}
+    delta["values"] = _diff_values(prev["values"], record["values"])
+    if "intervals" in record:
+        intervals = _diff_values(prev.get("intervals", {}), record["intervals"])
+        if intervals:
+            delta["intervals"] = intervals
+    return delta
+
+
+class _Stream(Sink):
+    """Sink behind one SSE stream: keeps the latest state and wakes clients.
+
+    The compute thread only stores the state; its record is built by the
+    first client thread that needs it, once per state.
+    """
+
+    def __init__(self, server, name, names):
+        super().__init__(names)
+        self.server = server
+        self.name = name
+        self.state = None
+        self.seq = 0
+        self.closed = False
+        self._record = None     # (seq, record) built from the latest state
+        self._cond = threading.Condition()
+
+    def emit(self, state):
+        with self._cond:
+            self.state = state
+            self.seq += 1
+            self._cond.notify_all()
+
+    @property
+    def record(self):
+        """Full record of the latest state (None before the first one)."""
+        with self._cond:
+            seq, state = self.seq, self.state
+        return self._record_of(seq, state)
+
+    def _record_of(self, seq, state):
+        if state is None:
+            return None
+        cached = self._record
+        if cached is not None and cached[0] == seq:
+            return cached[1]
+        record = state.to_dict(self.names)
+        self._record = (seq, record)
+        return record
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def wait(self, seq, timeout):
+        """``(seq, record)`` newer than *seq*, or None on timeout or close."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq or self.closed or self.server.closed,
+                                timeout)
+            if self.seq <= seq:
+                return None
+            seq, state = self.seq, self.state
+        return seq, self._record_of(seq, state)
+
+
+_PAGE = """<!doctype html>
+<meta charset="utf-8"><title>pyprogressive</title>
+<body style="font-family: monospace">
+<script>
+fetch("/streams").then(r => r.json()).then(streams => {
+  for (const name of Object.keys(streams)) {
+    const pre = document.body.appendChild(document.createElement("pre"));
+    let state = {values: {}, intervals: {}};
+    // group results and intervals arrive as the keys that changed
+    const merge = (old, changed, full) => {
+      const out = full ? {} : {...old};
+      for (const [k, v] of Object.entries(changed || {}))
+        out[k] = (v && typeof v === "object" && !Array.isArray(v) && !full) ? {...out[k], ...v} : v;
+      return out;
+    };
+    new EventSource("/streams/" + encodeURIComponent(name)).addEventListener("state", e => {
+      const d = JSON.parse(e.data);
+      state = {...d, values: merge(state.values, d.values, d.full),
+               intervals: merge(state.intervals, d.intervals, d.full)};
+      pre.textContent = name + "\\n" + JSON.stringify(state, null, 2);
+    });
+  }
+});
+</script>
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "pyprogressive"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.owner
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "":
+            self._send(200, "text/html; charset=utf-8", _PAGE.encode("utf-8"))
+        elif path == "/streams":
+            body = {name: stream.record for name, stream in server.streams.items()}
+            self._send(200, "application/json", json.dumps(body).encode("utf-8"))
+        elif path.startswith("/streams/") and unquote(path[9:]) in server.streams:
+            self._stream(server.streams[unquote(path[9:])])
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, stream):
+        """Push the stream's states until it is done: the first event holds
+        the full record, later ones only what changed since the last event
+        this client got.  A slow client skips straight to the latest state."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        seq, sent = 0, None
+        try:
+            while not self.server.owner.closed:
+                update = stream.wait(seq, self.server.owner.keepalive)
+                if update is None:
+                    if stream.closed:
+                        return
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                seq, record = update
+                if sent is None:
+                    event = dict(record, full=True)
+                else:
+                    event = _diff(sent, record)
+                sent = record
+                data = json.dumps(event, separators=(",", ":"))
+                self.wfile.write(f"id: {seq}\nevent: state\ndata: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if record["done"]:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return   # the client went away
+
+
+class ProgressServer:
+    """Local HTTP server streaming progressive estimates over Server-Sent Events.
+
+    Each stream is fed by a sink, so any number of browsers or processes
+    can watch a run without re-running it::
+
+        with pp.ProgressServer(port=8000) as server:
+            handle = server.run(program, "sales", names=["mean", "by_region"],
+                                interval=0.5)
+            handle.join()
+
+    ``GET /streams/<name>`` is an ``text/event-stream`` of ``state``
+    events: the first carries the full :meth:`IterState.to_dict` record
+    (with ``"full": true``), every later one only the values that changed
+    since that client's previous event.  A client that cannot keep up
+    skips to the latest state instead of queueing.  ``GET /streams`` returns
+    the latest record of every stream as JSON; ``GET /`` is a minimal page
+    that renders them live.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, keepalive=15.0):
+        self.keepalive = keepalive
+        self.streams = {}
+        self.closed = False
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name="pyprogressive-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def sink(self, name, names=None):
+        """A sink publishing to ``/streams/<name>``; pass it to ``run(sinks=...)``."""
+        if name in self.streams:
+            raise ValueError(f"Stream {name!r} already exists")
+        stream = self.streams[name] = _Stream(self, name, names)
+        return stream
+
+    def run(self, program, name, names=None, **run_options):
+        """Start *program* on a worker thread publishing to stream *name*;
+        returns the :class:`~pyprogressive.background.ProgressiveRun`."""
+        sinks = list(run_options.pop("sinks", None) or []) + [self.sink(name, names)]
+        return program.start(sinks=sinks, **run_options)
+
+    def close(self):
+        self.closed = True
+        for stream in self.streams.values():
+            stream.close()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
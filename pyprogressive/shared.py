@@ -0,0 +1,140 @@
+import time
+
+from .estimator import SimpleLinearEstimator
+from .groupby import group_by_bq_update
+from .midlevel import _Scan, _bq_batch_update
+
+
+class _SharedGroup:
+    """Accumulators of every GroupBy variable grouped by one key.
+
+    Stands in for their plans in ``group_by_bq_update``: the union of
+    their GBQ specs is folded into one group dict that all of them read.
+    """
+
+    def __init__(self, plan, group_dict):
+        self.encoder = plan.encoder
+        self.gbq_specs = list(plan.gbq_specs)
+        self.dict = group_dict
+
+    def merge(self, plan):
+        plan.encoder = self.encoder
+        names = {name for name, _, _ in self.gbq_specs}
+        for spec in plan.gbq_specs:
+            if spec[0] not in names:
+                self.gbq_specs.append(spec)
+                self.dict[spec[0]] = {}
+                if "M2" in self.dict:
+                    self.dict["M2"][spec[0]] = {}
+
+
+class SharedScan:
+    """Runs several programs over the same arrays in a single scan.
+
+    The BQs of all programs are deduplicated into one accumulator set and
+    GroupBy variables with the same key share their group accumulators, so
+    every row is read once however many programs are registered.  Each
+    program still gets IterStates on its own interval::
+
+        shared = pp.SharedScan()
+        shared.add(dashboard, interval=0.5)
+        shared.add(report, interval=5)
+        for program, state in shared.run():
+            ...
+
+    All programs must be compiled in the same :class:`~pyprogressive.Context`.
+    The scan is sequential; *confidence* applies to every program.
+    """
+
+    def __init__(self, *programs, interval=1, confidence=None):
+        self.confidence = confidence
+        self.entries = []   # [program, interval]
+        for program in programs:
+            self.add(program, interval)
+
+    def add(self, program, interval=1):
+        """Register *program*, ticking every *interval* seconds."""
+        if self.entries and program.context is not self.entries[0][0].context:
+            raise ValueError("Shared programs must be compiled in the same context")
+        self.entries.append([program, interval])
+        return self
+
+    def _compile(self):
+        scans = []
+        for program, _ in self.entries:
+            scan_state = _Scan(program.args, confidence=self.confidence, context=program.context)
+            program._scan = scan_state
+            scans.append(scan_state)
+        if any(s.total_len != scans[0].total_len for s in scans):
+            raise ValueError("Array's lengths must be same")
+
+        # one BQ dict for everyone: each scan evaluates from the shared means
+        self.BQ_dict = {}
+        self.bq_specs = {}
+        self.groups = {}   # key signature -> _SharedGroup
+        for scan_state in scans:
+            for spec in scan_state.bq_specs:
+                self.bq_specs.setdefault(spec[0], spec)
+                self.BQ_dict.setdefault(spec[0], 0)
+            scan_state.BQ_dict = self.BQ_dict
+            for var in scan_state.groups:
+                plan = scan_state.plans[id(var)]
+                signature = tuple(var.keys)
+                group = self.groups.get(signature)
+                if group is None:
+                    self.groups[signature] = _SharedGroup(plan, scan_state.BQ_group_dicts[id(var)])
+                else:
+                    group.merge(plan)
+                    scan_state.BQ_group_dicts[id(var)] = group.dict
+        self.bq_specs = list(self.bq_specs.values())
+        self.total_len = scans[0].total_len
+        self.pos = 0
+        return scans
+
+    def _step(self, scans, n):
+        n = min(n, self.total_len - self.pos)
+        rows = range(self.pos, self.pos + n)
+        _bq_batch_update(self.bq_specs, self.BQ_dict, rows, self.pos)
+        for group in self.groups.values():
+            for idx in rows:
+                group_by_bq_update(group, group.dict, idx)
+        self.pos += n
+        for scan_state in scans:
+            scan_state.pos = self.pos
+        return n
+
+    def run(self, tau=0.99, estimator=None):
+        """Scan once; yields ``(program, IterState)`` on each program's ticks
+        and a final (done) state for every program at the end."""
+        if not self.entries:
+            return
+        scans = self._compile()
+        if estimator is None:
+            estimator = SimpleLinearEstimator()
+
+        start = time.perf_counter()
+        deadlines = []
+        for scan_state, (_, interval) in zip(scans, self.entries):
+            scan_state.elapsed.start_time = start
+            deadlines.append(start + interval)
+
+        while self.pos < self.total_len:
+            now = time.perf_counter()
+            n = estimator.estimate_next(max(min(deadlines) - now, 0.0))
+            estimator.start()
+            estimator.end(self._step(scans, n))
+            if self.pos >= self.total_len:
+                break
+
+            for k, (program, interval) in enumerate(self.entries):
+                now = time.perf_counter()
+                if now < deadlines[k] - (1 - tau) * interval:
+                    continue
+                yield program, scans[k].snapshot()
+                deadlines[k] += interval
+                now = time.perf_counter()
+                if deadlines[k] < now:
+                    deadlines[k] = now + interval
+
+        for scan_state, (program, _) in zip(scans, self.entries):
+            yield program, scan_state.snapshot()
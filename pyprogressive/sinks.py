@@ -0,0 +1,258 @@
+import json
+import queue
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from .background import Mailbox
+
+
+class Sink:
+    """Receives every IterState of a run: ``program.run(sinks=[...])``.
+
+    ``emit(state)`` is called on the compute thread right before the state
+    is yielded, so it must be cheap; ``flush()`` is called when the run
+    ends (or is closed) and should make everything emitted visible.
+    Sinks are not closed by the run: use them as context managers, or
+    call ``close()``, once they are no longer needed.
+
+    *names* labels the compiled variables in the records (default
+    ``v0``, ``v1``, ...); with *changes*, records of a ``run(delta=...)``
+    only carry the group entries that changed since the previous record
+    (``"keyframe": false``).  See :meth:`IterState.to_dict`.
+    """
+
+    def __init__(self, names=None, changes=False):
+        self.names = names
+        self.changes = changes
+
+    def emit(self, state):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _encode(self, state):
+        return json.dumps(state.to_dict(self.names, changes=self.changes),
+                          separators=(",", ":"))
+
+
+class NDJSONSink(Sink):
+    """Appends one JSON record per state to a file (newline-delimited JSON).
+
+    *path* may be a file name (opened in append mode and closed by
+    :meth:`close`) or an open text file.  Lines are flushed to the OS on
+    every state unless *flush_every* says otherwise, so ``tail -f`` sees
+    each tick as it happens.  Every state is written, so *changes* records
+    can be replayed from the file.
+    """
+
+    def __init__(self, path, names=None, flush_every=1, changes=False):
+        super().__init__(names, changes)
+        if hasattr(path, "write"):
+            self._file, self._owned = path, False
+        else:
+            self._file, self._owned = open(path, "a", encoding="utf-8"), True
+        self.flush_every = flush_every
+        self._pending = 0
+
+    def emit(self, state):
+        self._file.write(self._encode(state) + "\n")
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self._owned:
+            self._file.close()
+
+
+class CallbackSink(Sink):
+    """Calls ``callback(state)`` on a worker thread, off the scan's hot path.
+
+    States are queued and delivered in order; with *latest_only* a slow
+    callback only sees the newest state and the others are dropped.  An
+    error raised by the callback is re-raised by the next ``emit`` or
+    ``flush``.  ``flush()`` waits until the callback has caught up.
+    """
+
+    def __init__(self, callback, latest_only=False):
+        super().__init__()
+        self.callback = callback
+        self.latest_only = latest_only
+        self.error = None
+        self._box = Mailbox() if latest_only else queue.Queue()
+        self._idle = threading.Condition()
+        self._emitted = 0       # seq of the newest state emitted
+        self._delivered = 0     # seq of the newest state the callback saw
+        self._thread = threading.Thread(target=self._work, name="pyprogressive-sink",
+                                        daemon=True)
+        self._thread.start()
+
+    def emit(self, state):
+        self._raise_error()
+        self._emitted += 1
+        self._box.put((self._emitted, state))
+
+    def flush(self):
+        with self._idle:
+            self._idle.wait_for(lambda: self._delivered >= self._emitted)
+        self._raise_error()
+
+    def close(self):
+        self.flush()
+        if self.latest_only:
+            self._box.close()
+        else:
+            self._box.put(None)
+        self._thread.join()
+
+    def _work(self):
+        while True:
+            item = self._box.take() if self.latest_only else self._box.get()
+            if item is None:
+                return
+            seq, state = item
+            try:
+                self.callback(state)
+            except Exception as exc:
+                self.error = exc
+            with self._idle:
+                self._delivered = seq
+                self._idle.notify_all()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+# Shared-memory ring layout (little endian):
+#   header : seq of the newest record (Q), slots (I), slot size (I)
+#   slot   : seq of its record (Q, 0 while being written), length (I), JSON
+_HEADER = struct.Struct("<QII")
+_SLOT = struct.Struct("<QI")
+
+_created = set()   # names of the rings created (and tracked) by this process
+
+
+class SharedMemoryRing(Sink):
+    """Publishes states into a ring of fixed-size slots in shared memory.
+
+    Another process on the machine attaches with
+    ``RingReader(ring.name)`` and polls for records; the writer never
+    waits for it.  Record *k* goes to slot ``k % slots``, so a reader that
+    falls more than *slots* records behind misses the overwritten ones.
+    A record longer than *slot_size* bytes of JSON raises ValueError.
+
+    :meth:`close` releases and (as the creator) unlinks the segment.
+    """
+
+    def __init__(self, name=None, slots=64, slot_size=4096, names=None):
+        super().__init__(names)
+        self.slots = slots
+        self.slot_size = slot_size
+        self._stride = _SLOT.size + slot_size
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=_HEADER.size + slots * self._stride)
+        self.name = self.shm.name
+        _created.add(self.name)
+        self.seq = 0
+        _HEADER.pack_into(self.shm.buf, 0, 0, slots, slot_size)
+
+    def emit(self, state):
+        data = self._encode(state).encode("utf-8")
+        if len(data) > self.slot_size:
+            raise ValueError(f"Record of {len(data)} bytes does not fit a "
+                             f"{self.slot_size}-byte slot")
+        self.seq += 1
+        buf = self.shm.buf
+        offset = _HEADER.size + (self.seq % self.slots) * self._stride
+        # mark the slot as being written, fill it, then publish it
+        _SLOT.pack_into(buf, offset, 0, len(data))
+        buf[offset + _SLOT.size:offset + _SLOT.size + len(data)] = data
+        _SLOT.pack_into(buf, offset, self.seq, len(data))
+        _HEADER.pack_into(buf, 0, self.seq, self.slots, self.slot_size)
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            _created.discard(self.name)
+            self.shm = None
+
+
+class RingReader:
+    """Reads the records of a :class:`SharedMemoryRing` by segment *name*."""
+
+    def __init__(self, name):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before Python 3.13 attaching registers the segment with the
+            # resource tracker, which would unlink it when this process exits
+            self.shm = shared_memory.SharedMemory(name=name)
+            if name not in _created:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        _, self.slots, self.slot_size = _HEADER.unpack_from(self.shm.buf, 0)
+        self._stride = _SLOT.size + self.slot_size
+        self.seq = 0        # newest record returned
+        self.missed = 0     # records overwritten before they were read
+
+    def _read(self, seq):
+        buf = self.shm.buf
+        offset = _HEADER.size + (seq % self.slots) * self._stride
+        for _ in range(100):
+            first, length = _SLOT.unpack_from(buf, offset)
+            data = bytes(buf[offset + _SLOT.size:offset + _SLOT.size + length])
+            again, _ = _SLOT.unpack_from(buf, offset)
+            if first == again == seq:
+                return json.loads(data)
+            if first > seq and again > seq:
+                return None          # overwritten by a newer record
+            time.sleep(0)            # being written: retry
+        return None
+
+    def poll(self):
+        """Records published since the last poll, oldest first."""
+        newest, _, _ = _HEADER.unpack_from(self.shm.buf, 0)
+        start = max(self.seq + 1, newest - self.slots + 1)
+        self.missed += start - (self.seq + 1)
+        records = []
+        for seq in range(start, newest + 1):
+            record = self._read(seq)
+            if record is None:
+                self.missed += 1
+            else:
+                records.append(record)
+        self.seq = newest
+        return records
+
+    def latest(self):
+        """The newest record, or None if nothing was published yet."""
+        newest, _, _ = _HEADER.unpack_from(self.shm.buf, 0)
+        return self._read(newest) if newest else None
+
+    def close(self):
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
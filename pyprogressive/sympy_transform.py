@@ -1,5 +1,8 @@
 # sympy_transform.py
 
+import functools
+from contextvars import ContextVar
+
 import sympy
 from sympy import sympify, simplify, Symbol, expand
 
@@ -12,9 +15,37 @@ from .expression import (
 )
 from .variable import Variable
 from .token import DataItemToken, DataLengthToken, GToken
-from .array import global_arraylist
+from .array import array
+from .context import current_context
+
+# symbol name -> node table of the conversion in progress (see scoped_symbols)
+_symbols = ContextVar("pyprogressive_symbols", default=None)
+
+
+def symbol_table():
+    """Symbol table of the conversion in progress."""
+    table = _symbols.get()
+    return table if table is not None else {}
+
+
+def scoped_symbols(fn):
+    """Run a conversion with its own symbol table.
+
+    node_to_sympy_expr registers every symbol it creates in the table, and
+    the way back only looks up symbols registered by the same conversion,
+    so every conversion gets a fresh table that is dropped afterwards: it
+    does not grow (or keep old arrays alive) across compiles, and
+    conversions on other threads or tasks do not see it.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _symbols.set({})
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _symbols.reset(token)
+    return wrapper
 
-token_map = {}
 
 def node_to_sympy_expr(node):
     if isinstance(node, int):
@@ -22,16 +53,22 @@ def node_to_sympy_expr(node):
     if isinstance(node, float):
         return sympy.Float(node)
     if isinstance(node, DataItemToken):
-        if node.id == "GToken" and node.index >= 0:
+        if node.id == "GToken" and isinstance(node.index, array):
+            # each(G, arr): per-group values taken from a separate aligned array
+            symbol_name = f"arr_GToken_a{node.index.id}"
+        elif node.id == "GToken" and node.index >= 0:
             # Encode value column so group_by_bq_update can use the right column
             symbol_name = f"arr_GToken_{node.index}"
+        elif node.index >= 0:
+            # each(arr, k): column k of a tuple array
+            symbol_name = f"arr_{node.id}c{node.index}"
         else:
             symbol_name = "arr_" + str(node.id)
-        token_map[symbol_name] = node
+        symbol_table()[symbol_name] = node
         return Symbol(symbol_name)
     if isinstance(node, DataLengthToken):
         symbol_name = f"DataLength_{node.arrayid}"
-        token_map[symbol_name] = {'type': 'DataLengthToken', 'arrayid': node.arrayid}
+        symbol_table()[symbol_name] = {'type': 'DataLengthToken', 'arrayid': node.arrayid}
         return Symbol(symbol_name)
     if isinstance(node, Variable):
         # Convert expr (in Variable) to sympy expression
@@ -55,13 +92,13 @@ def node_to_sympy_expr(node):
         return sympy.Pow(base_expr, exp_expr)
     if isinstance(node, BQ):
         symbol_name = node.name
-        token_map[symbol_name] = node
+        symbol_table()[symbol_name] = node
         return Symbol(symbol_name)
     
 
     if isinstance(node, GBQ):
         symbol_name = node.name
-        token_map[symbol_name] = node
+        symbol_table()[symbol_name] = node
         return Symbol(symbol_name)
     if isinstance(node, GroupBy):
         group_index_expr = node_to_sympy_expr(node.group_index)
@@ -69,7 +106,7 @@ def node_to_sympy_expr(node):
         return sympy.Function("GroupBy")(group_index_expr, node.array_index, expr_str)
     if isinstance(node, GToken):
         symbol_name = f"GToken_{node.access_index}"
-        token_map[symbol_name] = node
+        symbol_table()[symbol_name] = node
         return Symbol(symbol_name)
     
     raise TypeError(f"Unsupported node type in node_to_sympy_expr: {type(node)}")
@@ -86,8 +123,8 @@ def sympy_to_node(expr):
     if isinstance(expr, sympy.Symbol):
         name = str(expr)
         if name.startswith("arr_"):
-            if name in token_map:
-                return token_map[name]
+            if name in symbol_table():
+                return symbol_table()[name]
             return DataItemToken()
         
         if name.startswith("BQ_"):
@@ -107,7 +144,7 @@ def sympy_to_node(expr):
         if name.startswith("DataLength_"):
             try:
                 arrayid = int(name.split("_")[1])
-                found_array = next((a for a in global_arraylist if a.id == arrayid), None)
+                found_array = next((a for a in current_context().arrays if a.id == arrayid), None)
                 length_val = len(found_array.data) if found_array else None
                 if length_val is None:
                      print(f"Warning: Could not find array with ID {arrayid} during sympy_to_node conversion., this is in sympy_transform.py")
@@ -179,6 +216,7 @@ def sympy_to_node(expr):
     raise TypeError(f"Unsupported sympy expr type: {type(expr)} => {expr}")
 
 
+@scoped_symbols
 def flatten_with_sympy(root_node):
     """
     1) Node -> string
@@ -1,6 +1,6 @@
 from enum import Enum
 from .expression import Addition, Subtraction, Multiplication, Division, PowerN
-from .array import global_arraylist
+from .context import current_context
 
 global_G_arridx = None
 
@@ -74,7 +74,7 @@ class DataLengthToken():
             self.array = None 
             self.arrayid = arrayid
 
-            found_array = next((a for a in global_arraylist if a.id == arrayid), None)
+            found_array = next((a for a in current_context().arrays if a.id == arrayid), None)
             self.value = value if value is not None else (len(found_array.data) if found_array else None)
 
         else:
@@ -13,16 +13,25 @@ Usage inside a program.run() loop::
         ax2.scatter(state.value(covXY), state.value(varX))
 """
 
+import json
+import sys
+import threading
+import time
+
 try:
     import plotly.graph_objects as go
     import plotly.io as pio
     from plotly.subplots import make_subplots
+    from plotly.utils import PlotlyJSONEncoder
     from IPython.display import display as _ipy_display, HTML
     _DEPS_AVAILABLE = True
 except ImportError:
     _DEPS_AVAILABLE = False
 
 
+_FLOAT_SIZE = sys.getsizeof(1.0)
+
+
 def _require_deps():
     if not _DEPS_AVAILABLE:
         raise ImportError(
@@ -30,6 +39,157 @@ def _require_deps():
         )
 
 
+# Front end of _PlotWidget: draws the ``figure`` trait with its own Plotly.js
+# module (no global Plotly needed) and applies the deltas sent as custom
+# messages with extendTraces / restyle / relayout.
+_PLOT_ESM = """
+import Plotly from "https://esm.sh/plotly.js-dist-min@2";
+
+function render({ model, el }) {
+  const div = document.createElement("div");
+  el.appendChild(div);
+  const draw = () => {
+    const figure = model.get("figure");
+    Plotly.react(div, figure.data || [], figure.layout || {});
+  };
+  draw();
+  model.on("change:figure", draw);
+  model.on("msg:custom", (msg) => {
+    if (msg.extend_idx.length) Plotly.extendTraces(div, msg.extend, msg.extend_idx);
+    for (const [i, update] of msg.restyles) Plotly.restyle(div, update, [i]);
+    Plotly.relayout(div, msg.relayout);
+  });
+}
+export default { render };
+"""
+
+try:
+    import anywidget
+    import traitlets
+
+    class _PlotWidget(anywidget.AnyWidget):
+        """Live plot: full figures through the ``figure`` trait, per-tick
+        deltas through custom messages."""
+        _esm = _PLOT_ESM
+        figure = traitlets.Dict().tag(sync=True)
+except ImportError:
+    _PlotWidget = None
+
+
+def _plain_json(obj):
+    """*obj* with every value JSON-native (numpy arrays, dates, ...)."""
+    encoder = PlotlyJSONEncoder if _DEPS_AVAILABLE else json.JSONEncoder
+    return json.loads(json.dumps(obj, cls=encoder))
+
+
+# ---------------------------------------------------------------------------
+# History decimation
+# ---------------------------------------------------------------------------
+
+def _lttb(x, y, n):
+    """Indices of *n* points chosen by Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points; from each bucket in between it keeps
+    the point spanning the largest triangle with the previously kept point
+    and the mean of the next bucket, which preserves peaks and the shape.
+    """
+    size = len(y)
+    if n >= size:
+        return list(range(size))
+    if n < 3:
+        return [0, size - 1][:n]
+    every = (size - 2) / (n - 2)
+    keep = [0]
+    a = 0
+    for i in range(n - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        nstart, nend = end, min(int((i + 2) * every) + 1, size)
+        avg_x = sum(x[nstart:nend]) / (nend - nstart)
+        avg_y = sum(y[nstart:nend]) / (nend - nstart)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(size - 1)
+    return keep
+
+
+def _minmax(x, y, n):
+    """Indices of at most *n* points: the minimum and maximum of each bucket."""
+    size = len(y)
+    if n >= size:
+        return list(range(size))
+    buckets = max(n // 2, 1)
+    every = size / buckets
+    keep = set()
+    for i in range(buckets):
+        bucket = range(int(i * every), int((i + 1) * every))
+        keep.add(min(bucket, key=y.__getitem__))
+        keep.add(max(bucket, key=y.__getitem__))
+    return sorted(keep)
+
+
+def _stride(x, y, n):
+    """Indices of *n* evenly spaced points, last point included."""
+    size = len(y)
+    if n >= size:
+        return list(range(size))
+    step = size / n
+    return sorted({int(i * step) for i in range(n - 1)} | {size - 1})
+
+
+_DECIMATORS = {'lttb': _lttb, 'minmax': _minmax, 'stride': _stride}
+
+
+def _bin_labels(labels, factor):
+    """Labels of blocks of *factor* consecutive cells: ``'first–last'``."""
+    if factor <= 1:
+        return list(labels)
+    out = []
+    for i in range(0, len(labels), factor):
+        block = labels[i:i + factor]
+        out.append(str(block[0]) if len(block) == 1 else f'{block[0]}–{block[-1]}')
+    return out
+
+
+def _bin_matrix(z, max_cells):
+    """Block-average *z* so neither side exceeds *max_cells*.
+
+    Returns ``(binned, row_factor, col_factor)``; None cells are ignored
+    and a block of only None stays None.
+    """
+    n_rows = len(z)
+    n_cols = max((len(row) for row in z), default=0)
+    fr = max(-(-n_rows // max_cells), 1)
+    fc = max(-(-n_cols // max_cells), 1)
+    if fr == 1 and fc == 1:
+        return [[v for v in row] for row in z], 1, 1
+    binned = []
+    for r0 in range(0, n_rows, fr):
+        rows = z[r0:r0 + fr]
+        out = []
+        for c0 in range(0, n_cols, fc):
+            cells = [v for row in rows for v in row[c0:c0 + fc] if v is not None]
+            out.append(sum(cells) / len(cells) if cells else None)
+        binned.append(out)
+    return binned, fr, fc
+
+
+def _decimate(series, n, policy):
+    """Shrink the ``x``/``y`` history of *series* to about *n* points in place."""
+    x, y = series['x'], series['y']
+    try:
+        keep = _DECIMATORS[policy](x, y, n)
+    except TypeError:   # non-numeric values: fall back to even spacing
+        keep = _stride(x, y, n)
+    x[:] = [x[i] for i in keep]
+    y[:] = [y[i] for i in keep]
+
+
 # ---------------------------------------------------------------------------
 # LiveAxes — one subplot pane
 # ---------------------------------------------------------------------------
@@ -37,11 +197,13 @@ def _require_deps():
 class LiveAxes:
     """Accumulates chart data for a single subplot pane."""
 
-    def __init__(self, row, col):
+    def __init__(self, row, col, webgl_threshold=1000):
         self._row = row
         self._col = col
+        # Growing traces switch to WebGL (Scattergl) past this many points
+        self._webgl_threshold = webgl_threshold
         # Accumulated series (line/scatter grow across ticks)
-        self._line_series    = []   # [{'y': list, 'label': str}]
+        self._line_series    = []   # [{'x': list, 'y': list, 'label': str}]
         self._scatter_series = []   # [{'x': list, 'y': list, 'label': str}]
         self._bar_series     = []   # [{'values': dict|scalar|None, 'label': str}]
         # Per-tick call counters
@@ -73,7 +235,7 @@ class LiveAxes:
         idx = self._line_call_idx
         if idx >= len(self._line_series):
             self._line_series.append(
-                {'y': [], 'label': label or f'series{idx}'}
+                {'x': [], 'y': [], 'label': label or f'series{idx}'}
             )
         self._line_series[idx]['y'].append(value)
         self._line_call_idx += 1
@@ -119,16 +281,25 @@ class LiveAxes:
         }
 
     def heatmap(self, z, labels=None, zmin=None, zmax=None,
-                colorscale='RdBu', showscale=True):
+                colorscale='RdBu', showscale=True, max_cells=200):
         """Render a 2-D matrix *z* as a heatmap snapshot.
 
         *z* is a list-of-lists where each cell is a current scalar value
-        (e.g. ``state.value(corr12)``).
+        (e.g. ``state.value(corr12)``).  A matrix wider or taller than
+        *max_cells* is block-averaged down to it before it is sent, with
+        the labels of each block joined as ``'first–last'``; pass
+        ``max_cells=None`` to send every cell.
         """
         # Deep-copy z so that mutable list objects are safely snapshotted
+        if max_cells is None:
+            z, fr, fc = [[v for v in row] for row in z], 1, 1
+        else:
+            z, fr, fc = _bin_matrix(z, max_cells)
         self._heatmap_snapshot = {
-            'z':          [[v for v in row] for row in z],
+            'z':          z,
             'labels':     labels,
+            'xlabels':    _bin_labels(labels, fc) if labels else None,
+            'ylabels':    _bin_labels(labels, fr) if labels else None,
             'zmin':       zmin,
             'zmax':       zmax,
             'colorscale': colorscale,
@@ -180,24 +351,38 @@ class LiveAxes:
         self._pie_snapshot     = None
         self._heatmap_snapshot = None
 
-    def _build_traces(self, t_history):
-        """Return a list of Plotly traces for the current accumulated data."""
-        traces = []
+    def _scatter_kind(self, s):
+        """'Scattergl' once the series has outgrown the SVG threshold.
+
+        The switch is sticky, so a series decimated back under the
+        threshold does not flip back and force another full redraw.
+        """
+        if (not s.get('gl') and self._webgl_threshold is not None
+                and len(s['y']) > self._webgl_threshold):
+            s['gl'] = True
+        return 'Scattergl' if s.get('gl') else 'Scatter'
+
+    def _trace_specs(self):
+        """Return ``(kind, kwargs, grows)`` for every trace, in render order.
+
+        Growing traces (line/scatter) reference the live history lists
+        instead of copying them; snapshot traces carry their current data.
+        """
+        specs = []
 
         # Line series (accumulated)
         for s in self._line_series:
-            x = t_history[:len(s['y'])]
-            traces.append(go.Scatter(
-                x=list(x), y=list(s['y']),
+            specs.append((self._scatter_kind(s), dict(
+                x=s['x'], y=s['y'],
                 mode='lines', name=s['label'],
-            ))
+            ), True))
 
         # Scatter series (accumulated)
         for s in self._scatter_series:
-            traces.append(go.Scatter(
-                x=list(s['x']), y=list(s['y']),
+            specs.append((self._scatter_kind(s), dict(
+                x=s['x'], y=s['y'],
                 mode='markers', name=s['label'],
-            ))
+            ), True))
 
         # Bar series (snapshot)
         for s in self._bar_series:
@@ -205,26 +390,26 @@ class LiveAxes:
                 continue
             v = s['values']
             if isinstance(v, dict):
-                traces.append(go.Bar(
+                specs.append(('Bar', dict(
                     x=list(v.keys()), y=list(v.values()),
                     name=s['label'],
-                ))
+                ), False))
             else:
-                traces.append(go.Bar(
+                specs.append(('Bar', dict(
                     x=['value'], y=[v],
                     name=s['label'],
-                ))
+                ), False))
 
         # Pie snapshot
         if self._pie_snapshot is not None:
             v = self._pie_snapshot['values']
             if isinstance(v, dict):
-                traces.append(go.Pie(
+                specs.append(('Pie', dict(
                     labels=list(v.keys()),
                     values=list(v.values()),
                     hole=self._pie_snapshot['hole'],
                     showlegend=True,
-                ))
+                ), False))
 
         # Heatmap snapshot
         if self._heatmap_snapshot is not None:
@@ -236,15 +421,15 @@ class LiveAxes:
                 showlegend=False,
             )
             if h['labels']:
-                kw['x'] = h['labels']
-                kw['y'] = h['labels']
+                kw['x'] = h['xlabels']
+                kw['y'] = h['ylabels']
             if h['zmin'] is not None:
                 kw['zmin'] = h['zmin']
             if h['zmax'] is not None:
                 kw['zmax'] = h['zmax']
-            traces.append(go.Heatmap(**kw))
+            specs.append(('Heatmap', kw, False))
 
-        return traces
+        return specs
 
     def _get_shapes(self, xref, yref):
         """Return Plotly shape dicts for axhline / axvline."""
@@ -271,17 +456,38 @@ class LiveAxes:
 class LiveFigure:
     """Grid of LiveAxes subplots.  Rendered in-place on every tick."""
 
-    def __init__(self, rows, cols, figsize=None):
+    def __init__(self, rows, cols, figsize=None, incremental=True,
+                 max_points=2000, decimate='lttb', background=True, max_fps=10,
+                 webgl_threshold=1000):
+        if decimate not in _DECIMATORS:
+            raise ValueError(f"decimate must be one of {sorted(_DECIMATORS)}")
         self._rows    = rows
         self._cols    = cols
         self._axes    = [
-            [LiveAxes(r + 1, c + 1) for c in range(cols)]
+            [LiveAxes(r + 1, c + 1, webgl_threshold) for c in range(cols)]
             for r in range(rows)
         ]
         self._figsize   = figsize
-        self._t_history = []
         self._handle    = None
         self._suptitle  = None
+        # Incremental rendering: the figure is displayed as a _PlotWidget
+        # and ticks only send appended points and changed snapshots.
+        self._incremental = incremental
+        self._widget      = None   # displayed _PlotWidget, if any
+        self._structure   = None   # signature of the last full render
+        self._sent        = []     # points already sent, per growing trace
+        self._shapes      = None   # shapes of the last render
+        # Bounded history: a series reaching max_points is decimated to
+        # half of it, so memory and render cost do not grow with the run.
+        self._max_points  = max_points
+        self._decimate    = decimate
+        self._redraw      = False  # set when sent points were dropped
+        # Rendering off the compute thread: the loop only copies the data
+        # and a _Renderer builds and sends frames at up to max_fps.
+        self._background  = background
+        self._max_fps     = max_fps
+        self._renderer    = None
+        self._lock        = threading.Lock()
 
     def suptitle(self, text):
         """Set an overall title displayed above the progress bar."""
@@ -298,51 +504,70 @@ class LiveFigure:
             return self._axes[0]   # list → supports (ax1, ax2) = ...
         return self._axes          # 2-D list
 
-    def _flush(self, t, done, progress):
-        """Build/update the Plotly figure and push it to the Jupyter output."""
-        _require_deps()
-
-        self._t_history.append(t)
-        flat = self._flat_axes()
-
-        subplot_titles = [ax._title or '' for ax in flat]
-        specs = [[ax._get_spec() for ax in row] for row in self._axes]
-
-        fig = make_subplots(
-            rows=self._rows,
-            cols=self._cols,
-            subplot_titles=subplot_titles,
-            specs=specs,
+    def _series(self):
+        """Every accumulated (line and scatter) series."""
+        return [s for ax in self._flat_axes()
+                for s in ax._line_series + ax._scatter_series]
+
+    def _history_size(self):
+        """Approximate bytes held by the accumulated history."""
+        return sum(sys.getsizeof(h) + len(h) * _FLOAT_SIZE
+                   for s in self._series() for h in (s['x'], s['y']))
+
+    def _record(self, t):
+        """Stamp this tick's line points with *t* and keep every series
+        within ``max_points``."""
+        for ax in self._flat_axes():
+            for s in ax._line_series:
+                while len(s['x']) < len(s['y']):
+                    s['x'].append(t)
+        if self._max_points is None:
+            return
+        for s in self._series():
+            if len(s['y']) > self._max_points:
+                _decimate(s, self._max_points // 2, self._decimate)
+                self._redraw = True   # sent points were dropped
+
+    def _thin_history(self):
+        """Halve every series of the history; False if nothing to thin."""
+        with self._lock:
+            series = [s for s in self._series() if len(s['y']) >= 2]
+            if not series:
+                return False
+            for s in series:
+                _decimate(s, len(s['y']) // 2, self._decimate)
+            self._redraw = True   # the plot holds dropped points
+            return True
+
+    def _all_specs(self):
+        """``(kind, kwargs, grows)`` for every trace of the figure, in trace order."""
+        return [spec for ax in self._flat_axes()
+                for spec in ax._trace_specs()]
+
+    def _signature(self, specs):
+        """What a delta cannot change: grid, axes, and the set of traces."""
+        axes = tuple(
+            (ax._title, ax._xlabel, ax._ylabel, ax._ylim, ax._has_pie())
+            for ax in self._flat_axes()
         )
+        traces = tuple((kind, kw.get('name'), kw.get('mode'), grows)
+                       for kind, kw, grows in specs)
+        return (axes, traces, self._figsize)
 
-        for ax in flat:
-            for trace in ax._build_traces(self._t_history):
-                fig.add_trace(trace, row=ax._row, col=ax._col)
-            if ax._has_pie():
-                continue  # pie subplots have no xy axes
-            if ax._xlabel:
-                fig.update_xaxes(title_text=ax._xlabel,
-                                 row=ax._row, col=ax._col)
-            if ax._ylabel:
-                fig.update_yaxes(title_text=ax._ylabel,
-                                 row=ax._row, col=ax._col)
-            if ax._ylim is not None:
-                fig.update_yaxes(range=list(ax._ylim),
-                                 row=ax._row, col=ax._col)
-
-        # Reference lines (axhline / axvline)
+    def _all_shapes(self):
+        """Reference-line shapes of every xy subplot."""
         shapes = []
-        for i, ax in enumerate(flat):
+        for i, ax in enumerate(self._flat_axes()):
             if ax._has_pie():
                 continue
             subplot_idx = i + 1
             xref = 'x' if subplot_idx == 1 else f'x{subplot_idx}'
             yref = 'y' if subplot_idx == 1 else f'y{subplot_idx}'
             shapes.extend(ax._get_shapes(xref, yref))
-        if shapes:
-            fig.update_layout(shapes=shapes)
+        return shapes
 
-        # Progress bar in the figure title
+    def _title_text(self, t, done, progress):
+        """Overall title with the progress bar."""
         BAR_WIDTH = 20
         filled  = BAR_WIDTH if done else int(progress * BAR_WIDTH)
         bar_str = '█' * filled + '░' * (BAR_WIDTH - filled)
@@ -350,24 +575,239 @@ class LiveFigure:
         suffix  = f'[{bar_str}] {pct_int}% | {t:.1f}s'
         if done:
             suffix += ' ✓'
-        title_text = (f'{self._suptitle} — {suffix}'
-                      if self._suptitle else suffix)
+        return (f'{self._suptitle} — {suffix}'
+                if self._suptitle else suffix)
+
+    def _delta(self, specs, shapes):
+        """Changes since the last render.
+
+        Returns ``(extend, extend_idx, restyles, relayout)``: the appended
+        points of growing traces and their indices, ``(index, update)``
+        pairs for snapshot traces and layout updates.  Marks the points as
+        sent.
+        """
+        extend, extend_idx, restyles = {'x': [], 'y': []}, [], []
+        growing = 0
+        for i, (kind, kw, grows) in enumerate(specs):
+            if grows:
+                sent, n = self._sent[growing], len(kw['y'])
+                if n > sent:
+                    extend['x'].append(kw['x'][sent:n])
+                    extend['y'].append(kw['y'][sent:n])
+                    extend_idx.append(i)
+                self._sent[growing] = n
+                growing += 1
+            else:
+                restyles.append((i, {key: [value] for key, value in kw.items()}))
+        relayout = {}
+        if shapes != self._shapes:
+            relayout['shapes'] = shapes
+            self._shapes = shapes
+        return extend, extend_idx, restyles, relayout
+
+    def _flush(self, t, done, progress):
+        """Record this tick and get it on screen (called on the compute thread).
+
+        With a background renderer only a copy of the chart data is taken
+        here; building and sending the figure happen on the renderer
+        thread, at most ``max_fps`` times a second, always for the latest
+        tick.  The first render and the final one are made before
+        returning.
+        """
+        _require_deps()
+
+        with self._lock:
+            self._record(t)
+            frame = self._capture(t, done, progress)
+            # Reset per-tick state on all axes AFTER capturing the traces
+            for ax in self._flat_axes():
+                ax._reset_call_idx()
+
+        if not self._background or self._handle is None:
+            self._render(frame)
+            return
+        if self._renderer is None:
+            self._renderer = _Renderer(self._render, self._max_fps)
+        self._renderer.submit(frame)
+        if done:
+            self._renderer.wait()
+
+    def _capture(self, t, done, progress):
+        """Everything a render needs, copied so the loop can keep going."""
+        axes = []
+        for ax in self._flat_axes():
+            specs = [(kind, dict(kw, x=list(kw['x']), y=list(kw['y'])) if grows else kw, grows)
+                     for kind, kw, grows in ax._trace_specs()]
+            axes.append({
+                'row': ax._row, 'col': ax._col, 'spec': ax._get_spec(),
+                'title': ax._title, 'xlabel': ax._xlabel,
+                'ylabel': ax._ylabel, 'ylim': ax._ylim,
+                'pie': ax._has_pie(), 'specs': specs,
+            })
+        specs = [spec for entry in axes for spec in entry['specs']]
+        frame = {
+            'axes': axes,
+            'specs': specs,
+            'shapes': self._all_shapes(),
+            'structure': self._signature(specs),
+            'title': self._title_text(t, done, progress),
+            'redraw': self._redraw,
+            'done': done,
+        }
+        self._redraw = False
+        return frame
+
+    def _render(self, frame):
+        """Send *frame* as a delta when possible, else as a full figure."""
+        # the final frame is drawn in full, so the widget state (and a saved
+        # notebook) holds the whole figure
+        if (self._widget is not None and not frame['done']
+                and not frame['redraw'] and frame['structure'] == self._structure):
+            self._send_delta(frame['specs'], frame['shapes'], frame['title'])
+        else:
+            self._render_full(frame)
+            self._structure = frame['structure']
+
+    def _send_delta(self, specs, shapes, title_text):
+        """Send the appended points and changed snapshots to the widget."""
+        extend, extend_idx, restyles, relayout = self._delta(specs, shapes)
+        relayout['title.text'] = title_text
+        self._widget.send(_plain_json({
+            'extend': extend, 'extend_idx': extend_idx,
+            'restyles': restyles, 'relayout': relayout,
+        }))
+
+    def _render_full(self, frame):
+        """Build the whole figure and show it (as the widget's figure, or HTML)."""
+        axes = frame['axes']
+
+        subplot_titles = [entry['title'] or '' for entry in axes]
+        specs_grid = [[entry['spec'] for entry in axes[r * self._cols:(r + 1) * self._cols]]
+                      for r in range(self._rows)]
+
+        fig = make_subplots(
+            rows=self._rows,
+            cols=self._cols,
+            subplot_titles=subplot_titles,
+            specs=specs_grid,
+        )
+
+        for entry in axes:
+            row, col = entry['row'], entry['col']
+            for kind, kw, grows in entry['specs']:
+                fig.add_trace(getattr(go, kind)(**kw), row=row, col=col)
+            if entry['pie']:
+                continue  # pie subplots have no xy axes
+            if entry['xlabel']:
+                fig.update_xaxes(title_text=entry['xlabel'], row=row, col=col)
+            if entry['ylabel']:
+                fig.update_yaxes(title_text=entry['ylabel'], row=row, col=col)
+            if entry['ylim'] is not None:
+                fig.update_yaxes(range=list(entry['ylim']), row=row, col=col)
+
+        # Reference lines (axhline / axvline)
+        shapes = frame['shapes']
+        if shapes:
+            fig.update_layout(shapes=shapes)
 
-        layout_kw = {'title_text': title_text}
+        layout_kw = {'title_text': frame['title']}
         if self._figsize is not None:
             layout_kw['width']  = self._figsize[0]
             layout_kw['height'] = self._figsize[1]
         fig.update_layout(**layout_kw)
 
-        # Reset per-tick state on all axes AFTER building traces
-        for ax in flat:
-            ax._reset_call_idx()
+        self._sent = [len(kw['y']) for _, kw, grows in frame['specs'] if grows]
+        self._shapes = shapes
 
-        html = HTML(pio.to_html(fig, include_plotlyjs='cdn', full_html=False))
+        if self._incremental and _PlotWidget is not None:
+            figure = json.loads(fig.to_json())
+            if self._widget is not None:
+                self._widget.figure = figure
+                return
+            self._widget = output = _PlotWidget(figure=figure)
+        else:
+            # without anywidget every tick re-renders the HTML
+            output = HTML(pio.to_html(fig, include_plotlyjs='cdn', full_html=False))
         if self._handle is None:
-            self._handle = _ipy_display(html, display_id=True)
+            self._handle = _ipy_display(output, display_id=True)
         else:
-            self._handle.update(html)
+            self._handle.update(output)
+
+    def _close(self):
+        """Stop the background renderer, if any."""
+        if self._renderer is not None:
+            self._renderer.close()
+            self._renderer = None
+
+
+class _Renderer:
+    """Background thread that renders the latest submitted frame.
+
+    Frames submitted faster than *max_fps* are coalesced: only the newest
+    is rendered (a pending full redraw carries over to it).  An error
+    raised while rendering is re-raised by the next :meth:`submit`.
+    """
+
+    def __init__(self, render, max_fps):
+        self._render = render
+        self._period = 1.0 / max_fps if max_fps else 0.0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._closed = False
+        self.error = None
+        self.rendered = 0
+        self.coalesced = 0
+        self._thread = threading.Thread(target=self._work, name="pyprogressive-vis",
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced += 1
+                frame['redraw'] = frame['redraw'] or self._pending['redraw']
+            self._pending = frame
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until every submitted frame has been rendered."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _work(self):
+        last = float('-inf')
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed)
+                if self._closed:
+                    return
+                # hold the frame rate; newer frames replace this one meanwhile
+                delay = last + self._period - time.perf_counter()
+                if delay > 0 and not self._pending['done']:
+                    self._cond.wait_for(lambda: self._closed or self._pending['done'], delay)
+                    if self._closed:
+                        return
+                frame, self._pending = self._pending, None
+                self._busy = True
+            last = time.perf_counter()
+            try:
+                self._render(frame)
+                self.rendered += 1
+            except Exception as exc:
+                self.error = exc
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
 
 
 # ---------------------------------------------------------------------------
@@ -380,9 +820,21 @@ _live_figure = None   # currently active LiveFigure, or None
 def _live_reset():
     """Clear the active live figure (called by pp.reset())."""
     global _live_figure
+    if _live_figure is not None:
+        _live_figure._close()
     _live_figure = None
 
 
+def _live_memory():
+    """Bytes of history held by the active live figure (0 if none)."""
+    return _live_figure._history_size() if _live_figure is not None else 0
+
+
+def _live_thin():
+    """Halve the history of the active live figure; False if nothing to thin."""
+    return _live_figure is not None and _live_figure._thin_history()
+
+
 def _live_flush(t, done, progress):
     """Flush the active live figure (called by program.run() after each yield)."""
     if _live_figure is not None:
@@ -393,7 +845,9 @@ def _live_flush(t, done, progress):
 # Public API
 # ---------------------------------------------------------------------------
 
-def subplots(nrows=1, ncols=1, figsize=None):
+def subplots(nrows=1, ncols=1, figsize=None, incremental=True,
+             max_points=2000, decimate='lttb', background=True, max_fps=10,
+             webgl_threshold=1000):
     """Create (or reuse) a live subplot grid.
 
     Call this *inside* a ``for state in program.run():`` loop.
@@ -406,6 +860,30 @@ def subplots(nrows=1, ncols=1, figsize=None):
         Grid dimensions.
     figsize : (width, height) in pixels, optional
         e.g. ``figsize=(1200, 500)``.
+    incremental : bool
+        Display the figure as a widget and, after the first render, only
+        send the new points and changed snapshots instead of re-rendering
+        it.  The figure is redrawn in full when its structure changes (a
+        new series, title or axis label), on the final tick, and on every
+        tick when ``anywidget`` is not installed.
+    max_points : int or None
+        Capacity of every line/scatter history.  A series reaching it is
+        downsampled to half, so long runs keep constant memory and render
+        cost; ``None`` keeps every point.
+    decimate : {'lttb', 'minmax', 'stride'}
+        Downsampling policy: Largest-Triangle-Three-Buckets (default;
+        preserves the visual shape), per-bucket min/max (keeps extremes)
+        or even spacing.
+    background : bool
+        Build and send frames on a renderer thread, so the scan only pays
+        for copying the chart data.  Ticks arriving faster than *max_fps*
+        are coalesced; the latest one is always shown, and the final one
+        is on screen when the loop ends.
+    max_fps : float
+        Frame-rate cap of the background renderer.
+    webgl_threshold : int or None
+        Line/scatter series with more points are drawn as WebGL
+        (``Scattergl``) traces; ``None`` keeps SVG traces.
 
     Returns
     -------
@@ -424,7 +902,13 @@ def subplots(nrows=1, ncols=1, figsize=None):
     if (_live_figure is None
             or _live_figure._rows != nrows
             or _live_figure._cols != ncols):
-        _live_figure = LiveFigure(nrows, ncols, figsize=figsize)
+        if _live_figure is not None:
+            _live_figure._close()
+        _live_figure = LiveFigure(nrows, ncols, figsize=figsize,
+                                  incremental=incremental,
+                                  max_points=max_points, decimate=decimate,
+                                  background=background, max_fps=max_fps,
+                                  webgl_threshold=webgl_threshold)
     return _live_figure, _live_figure._axes_for_unpack()
 
 
@@ -105,5 +105,1066 @@ class TestCase5(unittest.TestCase):
         self.assertAlmostEqual(state.value(mean), 3.5, places=6)
 
 
+class TestCase6(unittest.TestCase):
+    """Composite and multi-array group keys."""
+    def setUp(self):
+        pp.reset()
+
+    def test_composite_key_same_array(self):
+        arr = pp.array([('A', 'x', 1), ('A', 'y', 2), ('B', 'x', 3),
+                        ('A', 'x', 5)])
+        mean = group((each(arr, 0), each(arr, 1)),
+                     accum(each(G, 2)) / accum(1))
+        compiled = pp.compile(mean)
+        for state in compiled.run(interval=0):
+            pass
+        result = state.value(mean)
+        self.assertEqual(set(result), {('A', 'x'), ('A', 'y'), ('B', 'x')})
+        self.assertAlmostEqual(result[('A', 'x')], 3.0, places=6)
+        self.assertAlmostEqual(result[('A', 'y')], 2.0, places=6)
+        self.assertAlmostEqual(result[('B', 'x')], 3.0, places=6)
+
+    def test_composite_key_separate_arrays(self):
+        region  = pp.array(['e', 'w', 'e', 'e'])
+        product = pp.array([1, 1, 2, 1])
+        sales   = pp.array([1.0, 2.0, 3.0, 4.0])
+        total = group((each(region), each(product)), accum(each(G, sales)))
+        compiled = pp.compile(total)
+        for state in compiled.run(interval=0):
+            pass
+        result = state.value(total)
+        self.assertAlmostEqual(result[('e', 1)], 5.0, places=6)
+        self.assertAlmostEqual(result[('w', 1)], 2.0, places=6)
+        self.assertAlmostEqual(result[('e', 2)], 3.0, places=6)
+
+    def test_runs_do_not_share_compiled_state(self):
+        keyed = pp.array([(k % 3, float(k)) for k in range(3000)])
+        total = group(each(keyed, 0), accum(each(G, 1)))
+        expr = total.expr
+        compiled = pp.compile(total)
+        compiled.explain()
+        first = compiled._drive(interval=0)
+        next(first)   # compiled and part-way through
+        state = list(compiled.run(interval=1))[-1]
+        # raw keys, and the user's GroupBy is left as it was
+        self.assertEqual(set(state.value(total)), {0, 1, 2})
+        self.assertIs(total.expr, expr)
+        self.assertFalse(hasattr(total, 'encoder'))
+        for state in first:
+            pass
+        self.assertEqual(state.value(total)[0], sum(float(k) for k in range(0, 3000, 3)))
+
+
+class TestCase7(unittest.TestCase):
+    """Columnar storage for tuple arrays."""
+    def setUp(self):
+        pp.reset()
+
+    def test_tuple_rows_are_transposed(self):
+        arr = pp.array([('A', 1.5, 2), ('B', 2.5, 4), ('A', 3.0, 6)])
+        self.assertEqual(arr.arity, 3)
+        self.assertEqual(list(arr.column(2)), [2, 4, 6])
+        self.assertEqual(arr.data[1], ('B', 2.5, 4))
+
+    def test_each_reads_requested_column(self):
+        arr = pp.array([('A', 1.5, 2), ('B', 2.5, 4), ('A', 3.0, 6)])
+        mean1 = accum(each(arr, 1)) / len(arr)
+        mean2 = accum(each(arr, 2)) / len(arr)
+        compiled = pp.compile(mean1, mean2)
+        for state in compiled.run(interval=0):
+            pass
+        self.assertAlmostEqual(state.value(mean1), 7.0 / 3, places=6)
+        self.assertAlmostEqual(state.value(mean2), 4.0, places=6)
+
+    def test_separate_columns(self):
+        arr = pp.array(['A', 'B', 'A'], [1, 2, 3])
+        total = group(each(arr, 0), accum(each(G, 1)))
+        compiled = pp.compile(total)
+        for state in compiled.run(interval=0):
+            pass
+        self.assertEqual(state.value(total), {'A': 4.0, 'B': 2.0})
+
+
+class TestCase8(unittest.TestCase):
+    """Schema inferred once at construction."""
+    def setUp(self):
+        pp.reset()
+
+    def test_schema(self):
+        arr = pp.array([('A', 1.0), ('B', 2.0)])
+        self.assertTrue(arr.schema.homogeneous)
+        self.assertEqual(arr.schema.arity, 2)
+        self.assertEqual(arr.schema.dtypes, [str, float])
+        self.assertIsNone(pp.array([1, 2, 3]).schema.arity)
+
+    def test_index_out_of_range_raises(self):
+        arr = pp.array([('A', 1.0), ('B', 2.0)])
+        with self.assertRaises(ValueError):
+            each(arr, 2)
+
+
+class TestCase9(unittest.TestCase):
+    """Stratified group-aware scan."""
+    def setUp(self):
+        pp.reset()
+
+    def _program(self):
+        arr = pp.array([('big', float(i % 7)) for i in range(200)] +
+                       [('small', 100.0), ('small', 102.0)])
+        mean  = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+        total = accum(each(arr, 1)) / len(arr)
+        return mean, total, pp.compile(mean, total)
+
+    def test_final_values_match_sequential(self):
+        mean, total, compiled = self._program()
+        for state in compiled.run(interval=0, scan="stratified", seed=0):
+            pass
+        expected_big = sum(float(i % 7) for i in range(200)) / 200
+        self.assertAlmostEqual(state.value(mean)['big'], expected_big, places=6)
+        self.assertAlmostEqual(state.value(mean)['small'], 101.0, places=6)
+        self.assertAlmostEqual(state.value(total),
+                               (expected_big * 200 + 202.0) / 202, places=6)
+
+    def test_rare_group_seen_first(self):
+        mean, total, compiled = self._program()
+        states = compiled.run(interval=0, scan="stratified", seed=0)
+        next(states)
+        second = next(states)   # round-robin: one row from each group
+        self.assertIn(second.value(mean)['small'], (100.0, 102.0))
+
+    def test_requires_groupby(self):
+        arr = pp.array([1, 2, 3])
+        compiled = pp.compile(accum(each(arr)))
+        with self.assertRaises(ValueError):
+            next(iter(compiled.run(interval=0, scan="stratified")))
+
+
+class TestCase10(unittest.TestCase):
+    """Per-group confidence intervals and freezing."""
+    def setUp(self):
+        pp.reset()
+        rows = [('A' if i % 2 else 'B', float(i % 5)) for i in range(400)]
+        self.arr = pp.array(rows)
+        self.mean = group(each(self.arr, 0), accum(each(G, 1)) / accum(1))
+
+    def test_intervals_cover_estimate_and_close_at_end(self):
+        compiled = pp.compile(self.mean)
+        states = list(compiled.run(interval=0, confidence=0.95))
+        middle = states[len(states) // 2]
+        for key, (lo, hi) in middle.interval(self.mean).items():
+            self.assertLessEqual(lo, middle.value(self.mean)[key])
+            self.assertGreaterEqual(hi, middle.value(self.mean)[key])
+            self.assertLess(lo, hi)
+        for key, (lo, hi) in states[-1].interval(self.mean).items():
+            self.assertAlmostEqual(lo, hi, places=9)
+
+    def test_no_intervals_without_confidence(self):
+        compiled = pp.compile(self.mean)
+        for state in compiled.run(interval=0):
+            pass
+        with self.assertRaises(ValueError):
+            state.interval(self.mean)
+
+    def test_freeze(self):
+        compiled = pp.compile(self.mean)
+        for state in compiled.run(interval=0, freeze=10.0):
+            pass
+        self.assertEqual(state.frozen(self.mean), {'A', 'B'})
+
+
+class TestCase11(unittest.TestCase):
+    """Adaptive batch sizes from the linear estimator."""
+    def setUp(self):
+        pp.reset()
+
+    def test_incremental_fit_matches_regression(self):
+        from pyprogressive.estimator import SimpleLinearEstimator
+        est = SimpleLinearEstimator(window=4)
+        samples = [(10, 0.011), (20, 0.019), (40, 0.042), (80, 0.079), (160, 0.161)]
+        for it, duration in samples:
+            est.record(it, duration)
+        # least squares over the window
+        xs, ys = zip(*samples[-4:])
+        x_mean, y_mean = sum(xs) / 4, sum(ys) / 4
+        m = (sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+             / sum((x - x_mean) ** 2 for x in xs))
+        c = y_mean - m * x_mean
+        self.assertEqual(est.estimate_next(0.5), int((0.5 - c) / m))
+
+    def test_custom_estimator_batches(self):
+        class FixedBatches:
+            def __init__(self):
+                self.rows = []
+            def estimate_next(self, tick):
+                return 4
+            def start(self): pass
+            def end(self, rows):
+                self.rows.append(rows)
+
+        arr = pp.array(list(range(10)))
+        mean = accum(each(arr)) / len(arr)
+        compiled = pp.compile(mean)
+        estimator = FixedBatches()
+        progress = [state.progress for state in
+                    compiled.run(interval=0, estimator=estimator)]
+        self.assertEqual(progress, [0.4, 0.8, 1.0])
+        self.assertEqual(estimator.rows, [4, 4, 2])
+        self.assertAlmostEqual(mean.value(), 4.5, places=6)
+
+
+class TestCase12(unittest.TestCase):
+    """Opt-in per-phase profiling."""
+    def setUp(self):
+        pp.reset()
+
+    def test_profile(self):
+        arr = pp.array([('A', 1.0), ('B', 2.0)] * 50)
+        mean = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+        compiled = pp.compile(mean)
+        seen = []
+        profiler = pp.Profiler()
+        profiler.add_hook(lambda phase, seconds: seen.append(phase))
+        for state in compiled.run(interval=0, profile=profiler):
+            pass
+        self.assertIs(compiled.profile, profiler)
+        self.assertEqual(state.profile['rows'], 100)
+        self.assertGreater(state.profile['phases']['group_update'], 0)
+        self.assertIn('compile', seen)
+        self.assertIn('tick jitter', profiler.report())
+
+    def test_reused_profiler(self):
+        import time
+        arr = pp.array([float(k) for k in range(1000)])
+        compiled = pp.compile(accum(each(arr)) / len(arr))
+        profiler = pp.Profiler()
+        time.sleep(0.2)   # created well before the run
+        for _ in range(2):
+            for state in compiled.run(interval=0, profile=profiler):
+                pass
+        summary = profiler.summary()
+        # the latest run only: rows and wall time do not carry over
+        self.assertEqual(summary['rows'], 1000)
+        self.assertLess(summary['wall'], 0.2)
+
+    def test_disabled_by_default(self):
+        arr = pp.array([1, 2, 3])
+        compiled = pp.compile(accum(each(arr)))
+        for state in compiled.run(interval=0):
+            pass
+        self.assertIsNone(state.profile)
+        self.assertIsNone(compiled.profile)
+
+
+class TestCase13(unittest.TestCase):
+    """Compile-time query plan."""
+    def setUp(self):
+        pp.reset()
+
+    def test_explain(self):
+        x = pp.array([1.0, 2.0, 3.0, 4.0])
+        y = pp.array([2.0, 2.0, 3.0, 5.0])
+        keyed = pp.array([('A', 1.0), ('A', 2.0), ('B', 3.0), ('B', 4.0)])
+        n = len(x)
+        mean = accum(each(x)) / n
+        cov = accum(each(x) * each(y)) / n - mean * accum(each(y)) / n
+        outside = each(x) + 1
+        gmean = group(each(keyed, 0), accum(each(G, 1)) / accum(1))
+        compiled = pp.compile(mean, cov, outside, gmean)
+
+        plan = compiled.explain()
+        paths = {bq['name']: bq['path'] for bq in plan.bqs}
+        self.assertEqual(paths['BQ_1_of_0'], 'sum')
+        self.assertEqual(paths['BQ_special_0_pow_1_mul_1_pow_1'], 'mul')
+        self.assertEqual(plan.groups[0]['groups'], 2)
+        flagged = {where for where, _ in plan.warnings}
+        self.assertIn(2, flagged)
+        # group updates are not the bulk of the per-row cost here
+        self.assertNotIn(3, flagged)
+        self.assertNotIn(0, flagged)
+        self.assertIn('ops/row', str(plan))
+
+        # explaining does not disturb a later run
+        for state in compiled.run(interval=0):
+            pass
+        self.assertAlmostEqual(state.value(mean), 2.5)
+        self.assertEqual(state.value(gmean), {'A': 1.5, 'B': 3.5})
+
+    def test_group_estimate(self):
+        import random
+        rng = random.Random(0)
+        keyed = pp.array([(rng.randrange(500), 1.0) for _ in range(50000)])
+        gsum = group(each(keyed, 0), accum(each(G, 1)))
+        plan = pp.compile(gsum).explain(sample=2000)
+        group_info = plan.groups[0]
+        self.assertFalse(group_info['groups_exact'])
+        self.assertTrue(400 <= group_info['groups'] <= 600)
+        self.assertIn('~', str(plan))
+        # the only per-row work: the row-by-row group path is flagged
+        self.assertIn(0, {where for where, _ in plan.warnings})
+
+
+class TestCase14(unittest.TestCase):
+    """ETA and pre-run runtime estimates."""
+    def setUp(self):
+        pp.reset()
+
+    def test_eta(self):
+        arr = pp.array(list(range(1000)))
+        compiled = pp.compile(accum(each(arr)) / len(arr))
+        states = list(compiled.run(interval=0))
+        self.assertEqual(states[-1].eta, 0.0)
+        for state in states[:-1]:
+            self.assertTrue(state.eta is None or state.eta >= 0)
+        self.assertTrue(any(state.eta for state in states[:-1]))
+
+    def test_estimate_runtime(self):
+        arr = pp.array([('A', 1.0), ('B', 2.0)] * 500)
+        mean = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+        compiled = pp.compile(mean)
+        estimate = compiled.estimate_runtime(interval=0.5, sample=100)
+        self.assertEqual(estimate['sample_rows'], 100)
+        self.assertEqual(estimate['rows'], 1000)
+        self.assertGreater(estimate['scan'], 0)
+        self.assertGreaterEqual(estimate['total'], estimate['compile'] + estimate['scan'])
+        for state in compiled.run(interval=0):
+            pass
+        self.assertEqual(state.value(mean), {'A': 1.0, 'B': 2.0})
+
+
+class TestCase15(unittest.TestCase):
+    """Memory accounting and budgets."""
+    def setUp(self):
+        pp.reset()
+
+    def test_memory_report(self):
+        from pyprogressive.sympy_transform import _symbols
+        arr = pp.array([(k % 7, float(k)) for k in range(700)])
+        mean = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+        compiled = pp.compile(mean)
+        for state in compiled.run(interval=0):
+            pass
+        report = compiled.memory_report()
+        self.assertGreater(report['arrays'][arr.id], 0)
+        self.assertGreater(report['groups'][0], 0)
+        self.assertEqual(report['total'], sum(report['arrays'].values()) + report['bq']
+                         + sum(report['groups'].values()) + report['vis'])
+        # conversions do not leave a symbol table behind
+        self.assertIsNone(_symbols.get())
+
+    def test_budget(self):
+        import warnings
+        arr = pp.array([(k % 50, float(k)) for k in range(5000)])
+        mean = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+        compiled = pp.compile(mean)
+        with self.assertRaises(pp.MemoryBudgetExceeded):
+            for state in compiled.run(interval=0.05, memory_budget=1000):
+                pass
+
+        for state in compiled.run(interval=0.05, confidence=0.95):
+            pass
+        report = compiled.memory_report()
+        budget = report['total'] - 1
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            for state in compiled.run(interval=0.05, confidence=0.95,
+                                      memory_budget=budget, on_budget='degrade'):
+                pass
+        self.assertTrue(any(issubclass(w.category, ResourceWarning) for w in caught))
+        with self.assertRaises(ValueError):
+            state.interval(mean)
+        self.assertEqual(state.value(mean)[0], 2475.0)
+
+
+class TestCase16(unittest.TestCase):
+    """Background runs with a latest-value mailbox."""
+    def setUp(self):
+        pp.reset()
+
+    def test_mailbox(self):
+        from pyprogressive.background import Mailbox
+        box = Mailbox()
+        box.put(1)
+        box.put(2)
+        self.assertEqual(box.take(), 2)
+        self.assertEqual(box.dropped, 1)
+        self.assertIsNone(box.take(timeout=0.01))
+        box.close()
+        self.assertIsNone(box.take())
+
+    def test_start(self):
+        arr = pp.array([('A', 1.0), ('B', 3.0)] * 500)
+        mean = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+        compiled = pp.compile(mean)
+        handle = compiled.start(interval=0)
+        states = list(handle)
+        handle.join()
+        self.assertTrue(states[-1].done)
+        self.assertEqual(states[-1].value(mean), {'A': 1.0, 'B': 3.0})
+        self.assertIs(handle.latest, states[-1])
+        self.assertFalse(handle.running)
+
+    def test_pause_cancel(self):
+        arr = pp.array(list(range(1000)))
+        compiled = pp.compile(accum(each(arr)) / len(arr))
+        handle = compiled.start(interval=0)
+        handle.pause()
+        first = handle.get(timeout=5)
+        self.assertTrue(handle.paused)
+        # the worker may finish one more tick before it sees the pause
+        while handle.get(timeout=0.05) is not None:
+            pass
+        paused_at = handle.latest.progress
+        self.assertIsNone(handle.get(timeout=0.05))
+        self.assertEqual(handle.latest.progress, paused_at)
+        handle.cancel()
+        handle.join(timeout=5)
+        self.assertFalse(handle.running)
+        self.assertLess(handle.latest.progress, 1.0)
+        self.assertLessEqual(first.progress, handle.latest.progress)
+
+    def test_error(self):
+        compiled = pp.compile(accum(each(pp.array([]))))
+        handle = compiled.start(interval=0)
+        with self.assertRaises(ValueError):
+            handle.join(timeout=5)
+
+
+class TestCase17(unittest.TestCase):
+    """Async iteration with arun()."""
+    def setUp(self):
+        pp.reset()
+
+    def test_arun(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        arr = pp.array([('A', 1.0), ('B', 3.0)] * 500)
+        mean = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+        total = accum(each(arr, 1)) / len(arr)
+        grouped, scalar = pp.compile(mean), pp.compile(total)
+
+        async def consume(program, **options):
+            states = []
+            async for state in program.arun(interval=0, **options):
+                states.append(state)
+            return states
+
+        async def main():
+            with ThreadPoolExecutor(1) as executor:
+                return await asyncio.gather(consume(grouped, step_time=0.001),
+                                            consume(scalar, executor=executor))
+
+        grouped_states, scalar_states = asyncio.run(main())
+        self.assertTrue(grouped_states[-1].done)
+        self.assertEqual(grouped_states[-1].value(mean), {'A': 1.0, 'B': 3.0})
+        self.assertAlmostEqual(scalar_states[-1].value(total), 2.0)
+
+    def test_arun_break(self):
+        import asyncio
+        arr = pp.array(list(range(1000)))
+        compiled = pp.compile(accum(each(arr)) / len(arr))
+
+        async def first():
+            async for state in compiled.arun(interval=0):
+                return state
+
+        self.assertFalse(asyncio.run(first()).done)
+
+    def test_arun_cancel_mid_batch(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        arr = pp.array([('A' if k % 3 else 'B', float(k)) for k in range(300000)])
+        compiled = pp.compile(group(each(arr, 0), accum(each(G, 1)) / accum(1)))
+        states = []
+
+        async def consume(executor):
+            async for state in compiled.arun(interval=0.1, step_time=0.2, executor=executor):
+                states.append(state)
+
+        async def main():
+            with ThreadPoolExecutor(1) as executor:
+                task = asyncio.ensure_future(consume(executor))
+                while not states:
+                    await asyncio.sleep(0.001)
+                # the next batch is running in the worker by now
+                await asyncio.sleep(0.02)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                # the worker is free again: the batch was waited for
+                return await asyncio.get_running_loop().run_in_executor(executor, lambda: 42)
+
+        self.assertEqual(asyncio.run(main()), 42)
+
+
+class TestCase18(unittest.TestCase):
+    """Program-scoped contexts."""
+    def setUp(self):
+        pp.reset()
+
+    def test_isolation(self):
+        outer = pp.array([1.0, 2.0, 3.0])
+        ctx = pp.Context()
+        with ctx:
+            inner = pp.array([10.0, 20.0])
+            mean = accum(each(inner)) / len(inner)
+            compiled = pp.compile(mean)
+            self.assertEqual(inner.id, 0)
+        self.assertEqual(len(ctx.arrays), 1)
+        from pyprogressive.array import global_arraylist
+        self.assertEqual(global_arraylist, [outer])
+
+        # a reset of the default context leaves the program's context alone
+        pp.reset()
+        for state in compiled.run(interval=0):
+            pass
+        self.assertAlmostEqual(state.value(mean), 15.0)
+
+    def test_threads(self):
+        import threading
+        results = {}
+
+        def work(k):
+            with pp.Context():
+                arr = pp.array([('A', float(k)), ('B', float(k + 1))] * 200)
+                mean = group(each(arr, 0), accum(each(G, 1)) / accum(1))
+                compiled = pp.compile(mean)
+            for state in compiled.run(interval=0):
+                pass
+            results[k] = state.value(mean)
+
+        threads = [threading.Thread(target=work, args=(k,)) for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for k in range(4):
+            self.assertAlmostEqual(results[k]['A'], k)
+            self.assertAlmostEqual(results[k]['B'], k + 1)
+
+    def test_interleaved_tasks(self):
+        import asyncio
+        from pyprogressive.context import current_context
+        ctx = pp.Context()
+        seen = []
+
+        async def first(entered, other_entered, left):
+            with ctx:
+                entered.set()
+                await other_entered.wait()
+            # left while the other task is still inside
+            left.set()
+            seen.append(current_context() is not ctx)
+
+        async def second(other_entered, entered, other_left):
+            await other_entered.wait()
+            with ctx:
+                entered.set()
+                await other_left.wait()
+                seen.append(current_context() is ctx)
+            seen.append(current_context() is not ctx)
+
+        async def main():
+            entered0, entered1, left0 = asyncio.Event(), asyncio.Event(), asyncio.Event()
+            await asyncio.gather(first(entered0, entered1, left0),
+                                 second(entered0, entered1, left0))
+
+        asyncio.run(main())
+        self.assertEqual(seen, [True, True, True])
+        self.assertIsNot(current_context(), ctx)
+
+
+class TestCase19(unittest.TestCase):
+    """Shared-scan execution of several programs."""
+    def setUp(self):
+        pp.reset()
+
+    def test_shared_scan(self):
+        x = pp.array([float(k) for k in range(100)])
+        keyed = pp.array([('A' if k % 2 else 'B', float(k)) for k in range(100)])
+        mean = accum(each(x)) / len(x)
+        square = accum(each(x) ** 2) / len(x)
+        gmean = group(each(keyed, 0), accum(each(G, 1)) / accum(1))
+        gsquare = group(each(keyed, 0), accum(each(G, 1) ** 2) / accum(1))
+        first = pp.compile(mean, gmean)
+        second = pp.compile(mean, square, gsquare)
+
+        shared = pp.SharedScan(first, second, interval=0)
+        final = {}
+        for program, state in shared.run():
+            final[id(program)] = state
+        self.assertEqual(len(shared.bq_specs), 2)   # BQ_1 and BQ_2 of x
+        self.assertEqual(len(shared.groups), 1)
+        self.assertTrue(final[id(first)].done and final[id(second)].done)
+        self.assertAlmostEqual(final[id(first)].value(mean), 49.5)
+        self.assertAlmostEqual(final[id(second)].value(square), 3283.5)
+        self.assertAlmostEqual(final[id(first)].value(gmean)['A'], 50.0)
+        self.assertAlmostEqual(final[id(second)].value(gsquare)['B'], 3234.0)
+
+    def test_context_mismatch(self):
+        arr = pp.array([1.0, 2.0])
+        first = pp.compile(accum(each(arr)))
+        with pp.Context():
+            other = pp.array([1.0, 2.0])
+            second = pp.compile(accum(each(other)))
+        with self.assertRaises(ValueError):
+            pp.SharedScan(first, second)
+
+
+class TestCase20(unittest.TestCase):
+    """Cooperative round-robin scheduler."""
+    def setUp(self):
+        pp.reset()
+
+    def test_scheduler(self):
+        x = pp.array([float(k) for k in range(2000)])
+        keyed = pp.array([('A' if k % 2 else 'B', float(k)) for k in range(2000)])
+        mean = accum(each(x)) / len(x)
+        gmean = group(each(keyed, 0), accum(each(G, 1)) / accum(1))
+        small, large = pp.compile(mean), pp.compile(gmean)
+
+        scheduler = pp.Scheduler(step_time=0.001)
+        large_task = scheduler.add(large, interval=0)
+        small_task = scheduler.add(small, interval=0, priority=1)
+        order, final = [], {}
+        for task, state in scheduler.run():
+            order.append(task)
+            final[task] = state
+        # the high-priority program gets the first slice
+        self.assertIs(order[0], small_task)
+        self.assertIs(small_task.program, small)
+        self.assertAlmostEqual(final[small_task].value(mean), 999.5)
+        self.assertEqual(final[large_task].value(gmean), {'B': 999.0, 'A': 1000.0})
+        stats = scheduler.stats()
+        self.assertTrue(stats[small_task]['done'] and stats[large_task]['done'])
+        self.assertEqual(stats[large_task]['rows'], 2000)
+        self.assertGreater(stats[large_task]['rows_per_sec'], 0)
+
+    def test_no_starvation(self):
+        keyed = pp.array([('A' if k % 2 else 'B', float(k)) for k in range(100000)])
+        x = pp.array([float(k) for k in range(100000)])
+        scan = pp.compile(group(each(keyed, 0), accum(each(G, 1)) / accum(1)))
+        query = pp.compile(accum(each(x)) / len(x))
+        scheduler = pp.Scheduler(step_time=0.001)
+        high = scheduler.add(scan, interval=0, priority=3)
+        low = scheduler.add(query, interval=0)
+        high_done = None
+        for task, state in scheduler.run():
+            if task is low:
+                high_done = scheduler.stats()[high]['done']
+                break
+        # the low-priority query got slices while the scan was running
+        self.assertIs(high_done, False)
+        self.assertGreater(scheduler.stats()[low]['rows'], 0)
+
+    def test_same_program_twice(self):
+        x = pp.array([float(k) for k in range(3000)])
+        program = pp.compile(accum(each(x)))
+        scheduler = pp.Scheduler(step_time=0.001)
+        first = scheduler.add(program, interval=0)
+        second = scheduler.add(program, interval=0, weight=2)
+        for task, state in scheduler.run():
+            pass
+        stats = scheduler.stats()
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(stats[first]['rows'], 3000)
+        self.assertEqual(stats[second]['rows'], 3000)
+
+    def test_remove(self):
+        x = pp.array([float(k) for k in range(1000)])
+        first = pp.compile(accum(each(x)))
+        second = pp.compile(accum(each(x) ** 2))
+        scheduler = pp.Scheduler(step_time=0.001)
+        first_task = scheduler.add(first, interval=0)
+        second_task = scheduler.add(second, interval=0)
+        seen = set()
+        for task, state in scheduler.run():
+            seen.add(task)
+            if task is first_task:
+                scheduler.remove(first_task)
+        self.assertEqual(seen, {first_task, second_task})
+        self.assertNotIn(first_task, scheduler.stats())
+
+
+class TestCase21(unittest.TestCase):
+    """Preemptible batches and tick jitter."""
+    def setUp(self):
+        pp.reset()
+
+    def test_max_tick_overshoot(self):
+        n = 20000
+        keyed = pp.array([('A' if k % 3 else 'B', float(k)) for k in range(n)])
+        gmean = group(each(keyed, 0), accum(each(G, 1)) / accum(1))
+        program = pp.compile(gmean)
+        states = list(program.run(interval=0.002, max_tick_overshoot=0.001))
+        final = states[-1]
+        self.assertTrue(final.done)
+        self.assertIsNone(final.jitter)
+        self.assertAlmostEqual(final.value(gmean)['B'], sum(range(0, n, 3)) / len(range(0, n, 3)))
+        ticks = [s.jitter for s in states[:-1]]
+        self.assertTrue(ticks)
+        self.assertLess(max(ticks), 0.05)
+
+    def test_jitter(self):
+        x = pp.array([float(k) for k in range(5000)])
+        program = pp.compile(accum(each(x)) / len(x))
+        states = list(program.run(interval=0.001))
+        self.assertTrue(all(isinstance(s.jitter, float) for s in states[:-1]))
+        self.assertIsNone(states[-1].jitter)
+
+
+class TestCase22(unittest.TestCase):
+    """Incremental live chart updates."""
+    def setUp(self):
+        pp.reset()
+
+    def test_delta(self):
+        from pyprogressive import vis
+        fig, ax = vis.subplots()
+        for tick in range(3):
+            ax.line(float(tick), label='mean')
+            ax.bar({'A': tick, 'B': 2 * tick})
+            fig._record(0.5 * (tick + 1))
+            specs = fig._all_specs()
+            if tick == 0:
+                structure = fig._signature(specs)
+                fig._sent = [1]
+                fig._shapes = []
+            else:
+                self.assertEqual(fig._signature(specs), structure)
+                extend, idx, restyles, relayout = fig._delta(specs, [])
+                # only the point of this tick is sent for the line
+                self.assertEqual(extend, {'x': [[0.5 * (tick + 1)]], 'y': [[float(tick)]]})
+                self.assertEqual(idx, [0])
+                self.assertEqual(restyles, [(1, {'x': [['A', 'B']], 'y': [[tick, 2 * tick]],
+                                                 'name': ['bar0']})])
+                self.assertEqual(relayout, {})
+            ax._reset_call_idx()
+        # a new series changes the structure and forces a full render
+        ax.line(0.0)
+        ax.line(1.0, label='other')
+        self.assertNotEqual(fig._signature(fig._all_specs()), structure)
+
+    def test_send_delta_to_widget(self):
+        import types
+        from pyprogressive import vis
+        sent = []
+        fig, ax = vis.subplots()
+        fig._widget, fig._sent, fig._shapes = types.SimpleNamespace(send=sent.append), [0], []
+        for tick in range(3):
+            ax.line(float(tick), label='mean')
+            ax.bar({'A': tick, 'B': 2 * tick})
+            fig._record(0.5 * (tick + 1))
+            if tick == 0:
+                fig._sent = [1]   # the first point went out with the full render
+            else:
+                fig._send_delta(fig._all_specs(), [], 'title')
+            ax._reset_call_idx()
+        # each message carries only the point appended on its tick
+        self.assertEqual([m['extend'] for m in sent],
+                         [{'x': [[1.0]], 'y': [[1.0]]}, {'x': [[1.5]], 'y': [[2.0]]}])
+        self.assertEqual([m['extend_idx'] for m in sent], [[0], [0]])
+        self.assertEqual(sent[-1]['restyles'], [[1, {'x': [['A', 'B']], 'y': [[2, 4]],
+                                                     'name': ['bar0']}]])
+        self.assertEqual(sent[-1]['relayout'], {'title.text': 'title'})
+        self.assertEqual(fig._sent, [3])
+
+
+class TestCase23(unittest.TestCase):
+    """Bounded, decimated live chart history."""
+    def setUp(self):
+        pp.reset()
+
+    def test_bounded_history(self):
+        from pyprogressive import vis
+        fig, ax = vis.subplots(max_points=100)
+        for tick in range(1000):
+            ax.line(float(tick % 50), label='saw')
+            ax.scatter(float(tick), float(-tick))
+            fig._record(float(tick))
+            ax._reset_call_idx()
+        line, scatter = ax._line_series[0], ax._scatter_series[0]
+        for series in (line, scatter):
+            self.assertLessEqual(len(series['y']), 100)
+            self.assertEqual(len(series['x']), len(series['y']))
+        # the ends and the extremes of the sawtooth survive
+        self.assertEqual(line['x'][-1], 999.0)
+        self.assertEqual(max(line['y']), 49.0)
+        self.assertEqual(min(line['y']), 0.0)
+        self.assertEqual(line['x'], sorted(line['x']))
+
+    def test_decimators(self):
+        from pyprogressive.vis import _lttb, _minmax, _stride
+        x = list(range(100))
+        y = [0.0] * 100
+        y[37] = 10.0
+        for pick in (_lttb, _minmax):
+            keep = pick(x, y, 10)
+            self.assertIn(37, keep)
+            self.assertLessEqual(len(keep), 10)
+        self.assertEqual(_stride(x, y, 4), [0, 25, 50, 99])
+        self.assertEqual(_lttb(x, y, 200), x)
+
+
+class TestCase24(unittest.TestCase):
+    """Throttled background rendering."""
+    def test_renderer(self):
+        import time
+        from pyprogressive.vis import _Renderer
+        shown = []
+        renderer = _Renderer(shown.append, max_fps=50)
+        for k in range(200):
+            renderer.submit({'tick': k, 'redraw': k == 3, 'done': k == 199})
+            time.sleep(0.0005)
+        renderer.wait()
+        renderer.close()
+        # ticks were coalesced, the last one is on screen
+        self.assertLess(len(shown), 200)
+        self.assertEqual(renderer.rendered + renderer.coalesced, 200)
+        self.assertEqual(shown[-1]['tick'], 199)
+        # a redraw request survives coalescing
+        self.assertTrue(any(frame['redraw'] for frame in shown))
+
+    def test_render_error(self):
+        def fail(frame):
+            raise RuntimeError("render failed")
+        from pyprogressive.vis import _Renderer
+        renderer = _Renderer(fail, max_fps=None)
+        renderer.submit({'redraw': False, 'done': True})
+        renderer.wait()
+        with self.assertRaises(RuntimeError):
+            renderer.submit({'redraw': False, 'done': True})
+        renderer.close()
+
+
+class TestCase25(unittest.TestCase):
+    """WebGL switching and heatmap binning."""
+    def setUp(self):
+        pp.reset()
+
+    def test_webgl_switch(self):
+        from pyprogressive import vis
+        fig, ax = vis.subplots(webgl_threshold=10, max_points=16)
+        kinds = []
+        for tick in range(40):
+            ax.scatter(float(tick), float(tick))
+            fig._record(float(tick))
+            kinds.append(fig._all_specs()[0][0])
+            ax._reset_call_idx()
+        self.assertEqual(kinds[:10], ['Scatter'] * 10)
+        # sticky once switched, even after decimation back under the threshold
+        self.assertEqual(set(kinds[10:]), {'Scattergl'})
+        self.assertLessEqual(len(ax._scatter_series[0]['y']), 16)
+
+    def test_heatmap_binning(self):
+        from pyprogressive import vis
+        fig, ax = vis.subplots()
+        n = 10
+        z = [[float(r * n + c) for c in range(n)] for r in range(n)]
+        z[0][0] = None
+        ax.heatmap(z, labels=[f'c{k}' for k in range(n)], max_cells=4)
+        h = ax._heatmap_snapshot
+        self.assertEqual(len(h['z']), 4)
+        self.assertEqual(len(h['z'][0]), 4)
+        # None cells are skipped in the block mean
+        self.assertAlmostEqual(h['z'][0][0], (1 + 2 + 10 + 11 + 12 + 20 + 21 + 22) / 8)
+        self.assertEqual(h['xlabels'][0], 'c0–c2')
+        self.assertEqual(h['xlabels'][-1], 'c9')
+        ax.heatmap(z, max_cells=None)
+        self.assertEqual(len(ax._heatmap_snapshot['z']), n)
+
+
+class TestCase26(unittest.TestCase):
+    """Headless sinks."""
+    def setUp(self):
+        pp.reset()
+        x = pp.array([float(k) for k in range(3000)])
+        keyed = pp.array([('A' if k % 2 else 'B', float(k)) for k in range(3000)])
+        self.mean = accum(each(x)) / len(x)
+        self.gmean = group(each(keyed, 0), accum(each(G, 1)) / accum(1))
+        self.program = pp.compile(self.mean, self.gmean)
+
+    def test_ndjson(self):
+        import io
+        import json
+        out = io.StringIO()
+        with pp.NDJSONSink(out, names=['mean', 'gmean']) as sink:
+            states = list(self.program.run(interval=0.001, sinks=[sink]))
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(records), len(states))
+        self.assertTrue(records[-1]['done'])
+        self.assertAlmostEqual(records[-1]['values']['mean'], 1499.5)
+        self.assertEqual(records[-1]['values']['gmean'], {'B': 1499.0, 'A': 1500.0})
+
+    def test_callback(self):
+        import threading
+        import time
+        seen, threads = [], set()
+
+        def slow(state):
+            threads.add(threading.get_ident())
+            time.sleep(0.002)
+            seen.append(state)
+
+        with pp.CallbackSink(slow) as sink:
+            states = list(self.program.run(interval=0.001, sinks=[sink]))
+            # the run flushed the sink: every state was delivered, in order
+            self.assertEqual(seen, states)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_shared_memory_ring(self):
+        with pp.SharedMemoryRing(slots=4) as ring, pp.RingReader(ring.name) as reader:
+            states = list(self.program.run(interval=0.001, sinks=[ring]))
+            records = reader.poll()
+            self.assertTrue(records[-1]['done'])
+            self.assertAlmostEqual(records[-1]['values']['v0'], 1499.5)
+            self.assertEqual(len(records) + reader.missed, len(states))
+            self.assertEqual(reader.latest(), records[-1])
+            self.assertEqual(reader.poll(), [])
+
+
+class TestCase27(unittest.TestCase):
+    """Server-Sent Events endpoint."""
+    def setUp(self):
+        pp.reset()
+
+    def _events(self, response):
+        import json
+        for line in response:
+            line = line.decode('utf-8').rstrip('\n')
+            if line.startswith('data: '):
+                yield json.loads(line[6:])
+
+    def test_sse_stream(self):
+        import json
+        import urllib.request
+        keyed = pp.array([('k%d' % (k % 50), float(k)) for k in range(20000)])
+        gsum = group(each(keyed, 0), accum(each(G, 1)))
+        program = pp.compile(gsum)
+        with pp.ProgressServer() as server:
+            sink = server.sink('sums', names=['sum'])
+            response = urllib.request.urlopen(server.url + '/streams/sums', timeout=10)
+            states = list(program.run(interval=0.001, sinks=[sink]))
+            values, events = {}, list(self._events(response))
+            for event in events:
+                for key, value in event['values']['sum'].items():
+                    values[key] = value
+            self.assertTrue(events[0]['full'])
+            self.assertTrue(events[-1]['done'])
+            # coalesced (never more events than states) yet complete
+            self.assertLessEqual(len(events), len(states))
+            self.assertEqual(values, {str(k): v for k, v in states[-1].value(gsum).items()})
+            listing = json.load(urllib.request.urlopen(server.url + '/streams', timeout=10))
+            self.assertTrue(listing['sums']['done'])
+
+    def test_diff(self):
+        from pyprogressive.server import _diff
+        prev = {'done': False, 'values': {'m': 1.0, 'g': {'a': 1, 'b': 2}}}
+        record = {'done': True, 'values': {'m': 1.0, 'g': {'a': 1, 'b': 3}}}
+        self.assertEqual(_diff(prev, record), {'done': True, 'values': {'g': {'b': 3}}})
+        prev['intervals'] = {'g': {'a': [0, 2], 'b': [1, 3]}}
+        record['intervals'] = {'g': {'a': [0, 2], 'b': [2, 4]}}
+        self.assertEqual(_diff(prev, record)['intervals'], {'g': {'b': [2, 4]}})
+
+    def test_no_record_without_clients(self):
+        keyed = pp.array([('k%d' % (k % 5), float(k)) for k in range(2000)])
+        program = pp.compile(group(each(keyed, 0), accum(each(G, 1))))
+        with pp.ProgressServer() as server:
+            sink = server.sink('sums')
+            states = list(program.run(interval=0.001, sinks=[sink]))
+            # the compute thread only stored the state
+            self.assertIs(sink.state, states[-1])
+            self.assertIsNone(sink._record)
+            self.assertTrue(sink.record['done'])
+
+
+class TestCase28(unittest.TestCase):
+    """Delta-encoded group results."""
+    def setUp(self):
+        pp.reset()
+
+    def _states(self, expr, **options):
+        program = pp.compile(expr)
+        return program, list(program.run(interval=0.0005, **options))
+
+    def test_delta_matches_full(self):
+        import random
+        rng = random.Random(3)
+        keyed = pp.array([(rng.randrange(300), float(k)) for k in range(20000)])
+        gmean = group(each(keyed, 0), accum(each(G, 1)) / accum(1))    # local
+        gsum = group(each(keyed, 0), accum(each(G, 1)))                 # estimated size
+        for expr in (gmean, gsum):
+            _, states = self._states(expr, delta=4)
+            self.assertGreater(len(states), 4)
+            self.assertEqual([s.keyframe for s in states[:5]], [True, False, False, False, True])
+            previous = {}
+            for state in states:
+                full = state.value(expr)
+                changed = state.changes(expr)
+                # applying the changes to the previous state gives this one
+                self.assertEqual({**previous, **changed}, full)
+                if not state.keyframe:
+                    self.assertEqual(changed, {k: v for k, v in full.items() if previous.get(k) != v})
+                previous = full
+            program = pp.compile(expr)
+            final = list(program.run(interval=1))[-1]
+            self.assertEqual(states[-1].value(expr), final.value(expr))
+
+    def test_local_groups_skip_unchanged(self):
+        # rows of group 'late' only arrive in the second half
+        keyed = pp.array([('early' if k < 5000 else 'late', float(k % 7 + 1))
+                          for k in range(10000)])
+        # group sizes cancel out: the value only depends on the group's rows
+        ratio = group(each(keyed, 0), accum(each(G, 1) * each(G, 1)) / accum(each(G, 1)))
+        _, states = self._states(ratio, delta=1000)
+        late = [s for s in states if 'late' in s.value(ratio)]
+        self.assertTrue(late)
+        self.assertTrue(all('early' not in s.changes(ratio) for s in late[1:]))
+        self.assertAlmostEqual(states[-1].value(ratio)['early'], 4.0, places=2)
+
+    def test_val_is_a_snapshot(self):
+        keyed = pp.array([('k%d' % (k % 5), float(k)) for k in range(20000)])
+        gsum = group(each(keyed, 0), accum(each(G, 1)))
+        program = pp.compile(gsum)
+        steps = program.run(interval=0.0005, delta=4)
+        next(steps)
+        val = gsum.value()
+        before = dict(val)
+        for state in steps:
+            pass
+        self.assertEqual(val, before)
+        self.assertEqual(gsum.value(), state.value(gsum))
+
+    def test_changes_records(self):
+        import io
+        import json
+        keyed = pp.array([('k%d' % (k % 40), float(k)) for k in range(20000)])
+        gsum = group(each(keyed, 0), accum(each(G, 1)))
+        out = io.StringIO()
+        sink = pp.NDJSONSink(out, names=['sum'], changes=True)
+        _, states = self._states(gsum, delta=4, sinks=[sink])
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r['keyframe'] for r in records], [s.keyframe for s in states])
+        values = {}
+        for record, state in zip(records, states):
+            if record['keyframe']:
+                values = {}
+            else:
+                self.assertEqual(record['values']['sum'],
+                                 {str(k): v for k, v in state.changes(gsum).items()})
+            values.update(record['values']['sum'])
+            self.assertEqual(values, {str(k): v for k, v in state.value(gsum).items()})
+        # without changes=True the records stay full
+        self.assertEqual(states[1].to_dict(['sum'])['values']['sum'],
+                         {str(k): v for k, v in states[1].value(gsum).items()})
+
+    def test_nan_is_not_a_change(self):
+        keyed = pp.array([('z' if k % 2 else 'a', float('nan') if k % 2 else 1.0)
+                          for k in range(20000)])
+        gsum = group(each(keyed, 0), accum(each(G, 1)))
+        _, states = self._states(gsum, delta=1000)
+        self.assertGreater(len(states), 2)
+        self.assertTrue(all('z' not in s.changes(gsum) for s in states[1:]))
+
+
 if __name__ == '__main__':
     unittest.main()